@@ -1,10 +1,22 @@
 from flask import Flask
 from flask_login import LoginManager
 from flask_cors import CORS
-from flask_mysqldb import MySQL
 from app.database import db  # ✅ Import the db instance
 from app.models import User  # ✅ Import the User model
-from app.extensions import bcrypt
+from app.extensions import cache, hasher
+from app.query_budget import init_query_budget
+from app.queries import check_endpoint_loaders
+from app.db_pool import init_db_pool
+from app.ratelimit import limiter
+from app.replicas import init_replicas
+from app.pubsub import hub
+from app.images import images
+from app.storage import storage, media_url
+from app.uploads import UploadRequest
+from app.response_cache import response_cache
+from app.trending import trending
+from app.notifier import notifier
+from app.user_cache import load_cached_user
 from flask_migrate import Migrate
 
 
@@ -13,26 +25,35 @@ login_manager = LoginManager()
 login_manager.session_protection = "strong"
 login_manager.login_view = "auth.login"
 
-# Initialize the MySQL instance
-mysql = MySQL()
-
-def create_app():
+def create_app(config_class="config.Config"):
     app = Flask(__name__)
-    CORS(app)
+    app.request_class = UploadRequest  # Multipart files stream through size and type checks
+    CORS(app, expose_headers=["X-Next-Cursor"])  # Pagination cursor header
 
     # Load config from config file
-    app.config.from_object("config.Config")
+    app.config.from_object(config_class)
     migrate.init_app(app, db)
     # Initialize extensions
+    init_db_pool(app, db)  # One pooled engine for every route (see app.db_pool)
+    init_replicas(app)  # Safe requests read from SQLALCHEMY_REPLICA_URIS when configured
     db.init_app(app)
-    bcrypt.init_app(app)
+    hasher.init_app(app)
+    limiter.init_app(app)
+    cache.init_app(app)
     login_manager.init_app(app)
-    mysql.init_app(app)  # Initialize MySQL with app configuration
+    init_query_budget(app)
+    hub.init_app(app)
+    images.init_app(app)
+    storage.init_app(app)
+    response_cache.init_app(app)
+    trending.init_app(app)
+    notifier.init_app(app)
+    app.jinja_env.globals["media_url"] = media_url
 
-    # User loader for flask-login
+    # User loader for flask-login; identities come from the user cache (app.user_cache)
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_cached_user(int(user_id))
 
     # Import and register Blueprints
     from app.auth.routes import auth
@@ -43,6 +64,8 @@ def create_app():
     from app.main.routes import main
     from app.interest.routes import interest
     from app.review.routes import review_bp
+    from app.media.routes import media
+    from app.notifications.routes import notifications
 
 
 
@@ -54,4 +77,10 @@ def create_app():
     app.register_blueprint(messages) 
     app.register_blueprint(interest) 
     app.register_blueprint(review_bp)
+    app.register_blueprint(media)
+    app.register_blueprint(notifications)
+    check_endpoint_loaders(app)  # Eager-loading options must name real endpoints
+
+    from app.commands import register_commands
+    register_commands(app)
     return app
@@ -1,9 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from app.extensions import bcrypt
 from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models import User
+from app.user_cache import invalidate_user
+from app.ratelimit import login_blocked, login_failed, login_succeeded
 
 # Create Blueprint
 auth = Blueprint("auth", __name__)
@@ -24,9 +25,8 @@ def register():
             flash("Email already registered!", "danger")
             return redirect(url_for("auth.register"))
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-
-        new_user = User(username=username, email=email, password_hash=hashed_password)
+        new_user = User(username=username, email=email)
+        new_user.set_password(password)
         db.session.add(new_user)
         db.session.commit()
 
@@ -43,12 +43,27 @@ def login():
         email = request.form.get("email").strip().lower()  # Convert to lowercase
         password = request.form.get("password")
 
+        # 🚦 Throttled before any bcrypt work, so credential stuffing can't eat the hashing budget
+        retry_after = login_blocked(request.remote_addr, email)
+        if retry_after:
+            flash(f"Too many login attempts. Try again in {retry_after} seconds.", "danger")
+            response = make_response(render_template("login.html"), 429)
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+
         user = User.query.filter_by(email=email).first()  # Email is now case-insensitive
 
         if not user or not user.check_password(password):
+            login_failed(email)
             flash("Invalid email or password.", "danger")
             return redirect(url_for("auth.login"))
 
+        login_succeeded(email)
+
+        # Moving to a new BCRYPT_LOG_ROUNDS happens one login at a time, while we have the plaintext
+        if user.rehash_password_if_needed(password):
+            db.session.commit()
+
         login_user(user)
         flash("Logged in successfully!", "success")
         return redirect(url_for("main.home"))
@@ -66,6 +81,7 @@ def dashboard():
 @auth.route("/logout")
 @login_required
 def logout():
+    invalidate_user(current_user.id)
     logout_user()
     flash("Logged out successfully!", "success")
     return redirect(url_for("main.home"))
@@ -0,0 +1,145 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """Interface for key/value caches used by the app (see Cache below)."""
+
+    def get(self, key):
+        """Return the cached value, or None when missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def incr(self, key, delta=1):
+        """Add delta to an existing integer entry and return the new value; missing keys stay missing (None)."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """Thread-safe in-process LRU cache with per-entry TTLs."""
+
+    def __init__(self, max_entries=10000, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key, delta=1):
+        with self._lock:
+            value = self.get(key)
+            if value is None:
+                return None
+            expires_at = self._entries[key][0]
+            self._entries[key] = (expires_at, value + delta)
+            return value + delta
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by every worker, stored in Redis."""
+
+    def __init__(self, url, default_ttl=300, prefix="cl:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RedisCache requires the `redis` package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        # INCRBY (which keeps the TTL) on keys that exist; missing keys stay missing, as incr() promises
+        self._incr_existing = self._client.register_script(
+            "if redis.call('exists', KEYS[1]) == 1 then return redis.call('incrby', KEYS[1], ARGV[1]) end"
+        )
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return int(raw) if raw.lstrip(b"-").isdigit() else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        # Integers are stored as Redis integers so incr() can use INCRBY; anything else is pickled
+        raw = value if isinstance(value, int) and not isinstance(value, bool) else pickle.dumps(value)
+        self._client.set(self.prefix + key, raw, ex=ttl or None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def incr(self, key, delta=1):
+        return self._incr_existing(keys=[self.prefix + key], args=[delta])
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+class Cache:
+    """Application cache; the backend is chosen by CACHE_BACKEND ("memory" or "redis")."""
+
+    def __init__(self):
+        self.backend = MemoryCache()
+
+    def init_app(self, app):
+        kind = app.config.get("CACHE_BACKEND", "memory")
+        default_ttl = app.config.get("CACHE_DEFAULT_TTL", 300)
+        if kind == "redis":
+            self.backend = RedisCache(app.config["CACHE_URL"], default_ttl=default_ttl)
+        else:
+            self.backend = MemoryCache(app.config.get("CACHE_MAX_ENTRIES", 10000), default_ttl)
+        app.extensions["cache"] = self
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def incr(self, key, delta=1):
+        return self.backend.incr(key, delta)
+
+    def clear(self):
+        self.backend.clear()
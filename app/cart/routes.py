@@ -1,13 +1,33 @@
-from flask import Blueprint, jsonify, request,render_template
+from datetime import datetime
+from flask import Blueprint, current_app, jsonify, request,render_template
 from flask_login import login_required, current_user
 from app.models import db, Cart, Interest, Product
+from app.counters import adjust_interest_count
+from app.facets import invalidate_facets
+from app.idempotency import idempotent
+from app.reservations import (
+    CartRejected, OutOfStock, ReservationConflict, apply_cart_operations, atomic, release_line, reserve,
+    sweep_due, sweep_expired_holds,
+)
+from app.response_cache import invalidate_product, response_cache
+from app.trending import trending
+from app.queries import shaped
 
 cart = Blueprint('cart', __name__)
 
 
+@cart.errorhandler(ReservationConflict)
+def reservation_conflict(error):
+    response = jsonify({"error": "This item is in high demand right now. Please try again."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
 # Add to Cart
 @cart.route("/cart/add/<int:product_id>", methods=["POST"])
 @login_required
+@idempotent
 def add_to_cart(product_id):
     data = request.get_json()
     quantity = data.get("quantity", 1)
@@ -17,53 +37,142 @@ def add_to_cart(product_id):
         return jsonify({"error": "Invalid quantity"}), 400
 
     # Check if product exists
-    product = Product.query.get(product_id)
+    product = db.session.query(Product.id, Product.user_id).filter_by(id=product_id).first()
     if not product:
         return jsonify({"error": "Product not found"}), 404
 
     # Prevent users from adding their own product
-    if product.user_id == current_user.id:
+    user_id = current_user.id  # Read once: the commit below expires the user
+    if product.user_id == user_id:
         return jsonify({"error": "You cannot add your own product to the cart"}), 403
 
-    # Check available stock
-    existing_item = Cart.query.filter_by(user_id=current_user.id, product_id=product_id).first()
-    total_quantity = existing_item.quantity + quantity if existing_item else quantity
-
-    if total_quantity > product.quantity_available:
+    # Hold the stock: a conditional UPDATE, so concurrent adds can never oversell
+    try:
+        hold = atomic(lambda: reserve(user_id, product_id, quantity))
+    except OutOfStock:
         return jsonify({"error": "Not enough stock available"}), 400
 
-    # Add or update cart item
-    if existing_item:
-        existing_item.quantity = total_quantity
-    else:
-        cart_item = Cart(user_id=current_user.id, product_id=product_id, quantity=quantity)
-        db.session.add(cart_item)
-
-    db.session.commit()
-    return jsonify({"message": "Product added to cart successfully"}), 200
+    stock_changed(product_id, hold.stock_before, hold.stock_after)
+    trending.record(product_id, "cart_add", actor_id=user_id)
+    release_lapsed_holds()
+    return jsonify({
+        "message": "Product added to cart successfully",
+        "cart_id": hold.cart_id,
+        "quantity": hold.quantity,
+        "reserved_until": hold.reserved_until.strftime("%Y-%m-%d %H:%M:%S"),
+    }), 200
 
 # Get Cart Items
 @cart.route("/cart", methods=["GET"])
 @login_required
 def get_cart():
-    cart_items = Cart.query.filter_by(user_id=current_user.id).all()
-    return render_template("cart.html", cart_items=cart_items)
+    cart_items = shaped(Cart.query).filter_by(user_id=current_user.id).all()
+    return render_template("cart.html", cart_items=cart_items, now=datetime.utcnow())
 
 # Remove Item from Cart
 @cart.route("/cart/remove/<int:cart_id>", methods=["DELETE"])
 @login_required
+@idempotent
 def remove_from_cart(cart_id):
-    cart_item = Cart.query.get(cart_id)
-    if not cart_item or cart_item.user_id != current_user.id:
+    def move_to_interest():
+        removed = release_line(current_user.id, cart_id)
+        if removed is None:
+            return None
+        product_id, _ = removed
+        # Move to Interested list, keeping the product's interest counter in step;
+        # a concurrent insert trips uq_interest_user_product and atomic() retries
+        already_interested = db.session.query(Interest.id).filter_by(
+            user_id=current_user.id, product_id=product_id
+        ).first() is not None
+        if not already_interested:
+            db.session.add(Interest(user_id=current_user.id, product_id=product_id))
+            adjust_interest_count(product_id, 1)
+        return removed, already_interested
+
+    result = atomic(move_to_interest)
+    if result is None:
         return jsonify({"error": "Item not found or unauthorized"}), 404
-    
-    # Add to Interested list
-    if cart_item:
-        interest_item = Interest(user_id=current_user.id, product_id=cart_item.product_id)
-        db.session.add(interest_item)
-        db.session.delete(cart_item)
-        db.session.commit()
-        return jsonify({"message": "Item removed from cart and added to interest list"}), 200
-
-    db.session.commit()
-    return jsonify({"message": "Item removed from cart"}), 200
+
+    (product_id, released), already_interested = result
+    if released:
+        stock_after = db.session.query(Product.quantity_available).filter_by(id=product_id).scalar()
+        stock_changed(product_id, stock_after - released, stock_after)
+    elif not already_interested:
+        invalidate_product(product_id)
+    return jsonify({"message": "Item removed from cart and added to interest list"}), 200
+
+
+# Add, update or remove many items at once
+@cart.route("/cart/batch", methods=["POST"])
+@login_required
+@idempotent
+def batch_update():
+    """Apply a list of cart operations in one transaction and return the whole cart.
+
+    Body: {"operations": [{"op": "add" | "set" | "remove", "product_id": 1, "quantity": 2}, ...]}.
+    "add" adds to the line, "set" replaces its quantity and "remove" deletes it
+    (without the move to the interest list that DELETE /cart/remove does).
+    Nothing changes unless every operation can be applied.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get("operations")
+    limit = current_app.config.get("CART_BATCH_MAX_OPERATIONS", 100)
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "operations must be a non-empty list"}), 400
+    if len(operations) > limit:
+        return jsonify({"error": f"At most {limit} operations per batch"}), 400
+
+    user_id = current_user.id  # Read once: the commit below expires the user
+    parsed, errors = [], []
+    for index, operation in enumerate(operations):
+        operation = operation if isinstance(operation, dict) else {}
+        op, product_id = operation.get("op"), operation.get("product_id")
+        quantity = operation.get("quantity", 1 if op == "add" else None)
+        if op not in ("add", "set", "remove"):
+            errors.append({"index": index, "error": "op must be add, set or remove"})
+        elif not isinstance(product_id, int) or isinstance(product_id, bool):
+            errors.append({"index": index, "error": "Invalid product_id"})
+        elif op != "remove" and (not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0):
+            errors.append({"index": index, "error": "Invalid quantity"})
+        else:
+            parsed.append((op, product_id, quantity))
+    if errors:
+        return jsonify({"error": "No changes were made", "errors": errors}), 400
+
+    try:
+        moved = atomic(lambda: apply_cart_operations(user_id, parsed))
+    except CartRejected as rejected:
+        errors = [
+            {"index": index, "product_id": product_id, "error": rejected.errors[product_id]}
+            for index, (_, product_id, _) in enumerate(parsed) if product_id in rejected.errors
+        ]
+        return jsonify({"error": "No changes were made", "errors": errors}), 400
+
+    for product_id, (before, after) in moved.items():
+        stock_changed(product_id, before, after)
+        if after < before:
+            trending.record(product_id, "cart_add", actor_id=user_id)
+    release_lapsed_holds()
+
+    cart_items = shaped(Cart.query).filter_by(user_id=user_id).order_by(Cart.id).all()
+    return jsonify({"message": "Cart updated", "cart": [item.serialize() for item in cart_items]}), 200
+
+
+def stock_changed(product_id, before, after):
+    """Drop cached pages showing a product's stock; lists and facets only when it went in or out of stock."""
+    crossed = (before > 0) != (after > 0)
+    invalidate_product(product_id, listings=crossed)
+    if crossed:
+        invalidate_facets()
+
+
+def release_lapsed_holds():
+    """Every RESERVATION_SWEEP_SECONDS, let a cart write also return the stock of every lapsed hold."""
+    if not sweep_due():
+        return
+    released, _ = sweep_expired_holds()
+    for product_id in released:
+        invalidate_product(product_id, listings=False)
+    if released:
+        response_cache.invalidate("products")  # Once per sweep: some of these may be back in stock
+        invalidate_facets()
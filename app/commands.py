@@ -0,0 +1,61 @@
+import click
+
+
+def register_commands(app):
+    """Attach maintenance commands to the `flask` CLI."""
+
+    @app.cli.command("repair-interest-counts")
+    def repair_interest_counts():
+        """Recompute Product.interested_count from the Interest table."""
+        from app.counters import reconcile_interest_counts
+
+        fixed = reconcile_interest_counts()
+        click.echo(f"Repaired interest counters on {fixed} product(s).")
+
+    @app.cli.command("repair-ratings")
+    def repair_ratings():
+        """Recompute Product rating aggregates from the Review table."""
+        from app.counters import reconcile_ratings
+
+        fixed = reconcile_ratings()
+        click.echo(f"Repaired rating aggregates on {fixed} product(s).")
+
+    @app.cli.command("release-expired-holds")
+    def release_expired_holds():
+        """Return the stock of lapsed cart holds and prune old idempotency keys."""
+        from app.facets import invalidate_facets
+        from app.reservations import sweep_expired_holds
+        from app.response_cache import invalidate_product, response_cache
+
+        released, pruned = sweep_expired_holds()
+        for product_id in released:
+            invalidate_product(product_id, listings=False)
+        if released:
+            response_cache.invalidate("products")
+            invalidate_facets()
+        click.echo(f"Released {sum(released.values())} held unit(s) on {len(released)} product(s); "
+                   f"pruned {pruned} idempotency key(s).")
+
+    @app.cli.command("sync-replicas")
+    def sync_replicas():
+        """Copy the primary SQLite database over the SQLite replicas (local read-replica testing)."""
+        from app.replicas import sync_sqlite_replicas
+
+        for path in sync_sqlite_replicas(app):
+            click.echo(f"Copied primary to {path}")
+
+    @app.cli.command("check-indexes")
+    @click.option("--verbose", is_flag=True, help="Print every query plan.")
+    def check_indexes(verbose):
+        """EXPLAIN each hot query and fail if one no longer uses its index."""
+        from app.explain import check_hot_queries
+
+        failures = 0
+        for name, index_name, plan, ok in check_hot_queries():
+            click.echo(f"{'ok  ' if ok else 'FAIL'} {name} -> {index_name}")
+            if verbose or not ok:
+                click.echo("     " + plan.replace("\n", "\n     "))
+            failures += not ok
+
+        if failures:
+            raise SystemExit(1)
@@ -0,0 +1,93 @@
+from flask import current_app
+from sqlalchemy import case, func, update
+from app.database import db
+from app.models import Product, Interest, Review
+
+
+def adjust_interest_count(product_id, delta):
+    """Atomically shift a product's stored interest counter inside the current transaction."""
+    Product.query.filter_by(id=product_id).update(
+        {Product.interested_count: Product.interested_count + delta},
+        synchronize_session=False,
+    )
+
+
+def rating_prior():
+    """(weight, mean) of the Bayesian prior: a new product counts as `weight` reviews of `mean` stars."""
+    return current_app.config.get("RATING_PRIOR_WEIGHT", 5), current_app.config.get("RATING_PRIOR_MEAN", 3.5)
+
+
+def adjust_rating(product_id, rating, sign=1):
+    """Add (sign=1) or remove (sign=-1) one review's rating from a product's aggregates in a single UPDATE.
+
+    rating_bayes is 0 for unreviewed products, so they sort after every rated one.
+    """
+    weight, mean = rating_prior()
+    new_count = Product.rating_count + sign
+    new_sum = Product.rating_sum + sign * rating
+    bucket = getattr(Product, f"rating_{rating}")
+    # rating_bayes is assigned first and built from the old columns plus the delta: MySQL applies
+    # SET assignments left to right, so any later position would see the already-updated totals
+    db.session.execute(
+        update(Product).where(Product.id == product_id).ordered_values(
+            (Product.rating_bayes, case(
+                (new_count > 0, (weight * mean + new_sum) * 1.0 / (weight + new_count)), else_=0.0
+            )),
+            (Product.rating_count, new_count),
+            (Product.rating_sum, new_sum),
+            (bucket, bucket + sign),
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def reconcile_interest_counts():
+    """Recount interests for every product and fix any drifted counters. Returns the number of fixed rows."""
+    actual = dict(
+        db.session.query(Interest.product_id, func.count(Interest.id))
+        .group_by(Interest.product_id)
+        .all()
+    )
+
+    fixed = 0
+    for product_id, stored in db.session.query(Product.id, Product.interested_count).all():
+        expected = actual.get(product_id, 0)
+        if stored != expected:
+            Product.query.filter_by(id=product_id).update(
+                {Product.interested_count: expected}, synchronize_session=False
+            )
+            fixed += 1
+
+    db.session.commit()
+    return fixed
+
+
+def reconcile_ratings():
+    """Rebuild every product's rating aggregates from the Review table. Returns the number of fixed rows."""
+    weight, mean = rating_prior()
+    histograms = {}
+    for product_id, rating, n in (
+        db.session.query(Review.product_id, Review.rating, func.count(Review.id))
+        .group_by(Review.product_id, Review.rating)
+        .all()
+    ):
+        if 1 <= rating <= 5:
+            histograms.setdefault(product_id, [0] * 5)[rating - 1] = n
+
+    fixed = 0
+    for product in Product.query.all():
+        buckets = histograms.get(product.id, [0] * 5)
+        count = sum(buckets)
+        total = sum(stars * n for stars, n in enumerate(buckets, start=1))
+        expected = {
+            "rating_count": count,
+            "rating_sum": total,
+            **{f"rating_{stars}": n for stars, n in enumerate(buckets, start=1)},
+            "rating_bayes": (weight * mean + total) / (weight + count) if count else 0.0,
+        }
+        if any(abs((getattr(product, name) or 0) - value) > 1e-9 for name, value in expected.items()):
+            for name, value in expected.items():
+                setattr(product, name, value)
+            fixed += 1
+
+    db.session.commit()
+    return fixed
@@ -1,3 +1,4 @@
 from flask_sqlalchemy import SQLAlchemy
+from app.replicas import RoutingSession
 
-db = SQLAlchemy()  # ✅ Define a single global db instance
+db = SQLAlchemy(session_options={"class_": RoutingSession})  # ✅ Define a single global db instance; reads may go to replicas
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import deque
+from flask import jsonify
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Counters for connection checkouts, shared by every TimedQueuePool in the process."""
+
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=samples)  # Recent checkout waits, in seconds
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def observe(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            self._waits.append(waited)
+
+    def reset(self):
+        with self._lock:
+            self._waits.clear()
+            self.checkouts = self.timeouts = 0
+            self.total_wait = self.max_wait = 0.0
+
+    def snapshot(self, pool=None):
+        """Current counters plus live occupancy when the pool is a QueuePool."""
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "avg": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                    "p95": round(waits[int(len(waits) * 0.95) - 1] * 1000, 3) if waits else 0.0,
+                    "max": round(self.max_wait * 1000, 3),
+                },
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            pool_metrics.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.observe(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* / DB_STATEMENT_TIMEOUT_MS settings."""
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri:
+        return {}
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    timeout_ms = config.get("DB_STATEMENT_TIMEOUT_MS")
+
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}  # In-memory SQLite needs Flask-SQLAlchemy's single shared connection
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": config.get("DB_POOL_SIZE", 10),
+        "max_overflow": config.get("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+    }
+    if timeout_ms:
+        if backend == "postgresql":
+            options["connect_args"] = {"options": f"-c statement_timeout={int(timeout_ms)}"}
+        elif backend in ("mysql", "mariadb"):
+            options["connect_args"] = {"init_command": f"SET SESSION max_execution_time = {int(timeout_ms)}"}
+        elif backend == "sqlite":
+            # Closest SQLite has: how long to wait on a locked database before failing
+            options["connect_args"] = {"timeout": timeout_ms / 1000}
+    return options
+
+
+def init_db_pool(app, db):
+    """Configure the engine's pool from config; call before db.init_app(app)."""
+    if not app.config.get("SQLALCHEMY_ENGINE_OPTIONS"):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+
+    if app.config.get("DB_POOL_METRICS_ENABLED"):
+        def db_pool_metrics():
+            """Checkout counts, wait times and occupancy of the connection pool."""
+            return jsonify(pool_metrics.snapshot(db.engine.pool))
+        app.add_url_rule("/metrics/db-pool", "db_pool_metrics", db_pool_metrics)
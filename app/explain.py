@@ -0,0 +1,66 @@
+from sqlalchemy import func, select
+from app.database import db
+from app.models import Product, Message, Interest, Cart, Review, Notification
+
+
+def hot_queries():
+    """(name, table, expected index, statement) for every query the indexes were designed around."""
+    available = Product.quantity_available > 0
+    return [
+        ("listings by category, price order", "product", "ix_product_category_price_id",
+         select(Product).where(available, Product.category == "Books")
+         .order_by(Product.price, Product.id).limit(25)),
+        ("listings, price order", "product", "ix_product_price_id",
+         select(Product).where(available).order_by(Product.price, Product.id).limit(25)),
+        ("listings, best rated first", "product", "ix_product_rating_bayes_id",
+         select(Product).where(available).order_by(Product.rating_bayes.desc(), Product.id.desc()).limit(25)),
+        ("my listings", "product", "ix_product_user_id",
+         select(Product).where(Product.user_id == 1)),
+        ("unread badge count", "message", "ix_message_receiver_read_sender",
+         select(func.count(Message.id)).where(Message.receiver_id == 1, Message.is_read == False)),
+        ("conversation since_id", "message", "ix_message_sender_receiver_id",
+         select(Message).where(Message.sender_id == 1, Message.receiver_id == 2, Message.id > 100)
+         .order_by(Message.id).limit(50)),
+        ("interest status", "interest", "uq_interest_user_product",
+         select(Interest).where(Interest.user_id == 1, Interest.product_id == 1)),
+        ("interests on a product", "interest", "ix_interest_product_id",
+         select(func.count(Interest.id)).where(Interest.product_id == 1)),
+        ("cart line lookup", "cart", "uq_cart_user_product",
+         select(Cart).where(Cart.user_id == 1, Cart.product_id == 1)),
+        ("lapsed holds on a product", "cart", "ix_cart_product_reserved",
+         select(Cart.id).where(Cart.product_id == 1, Cart.reserved_until < "2026-01-01")),
+        ("lapsed holds sweep", "cart", "ix_cart_reserved_until",
+         select(Cart.id).where(Cart.reserved_until < "2026-01-01")),
+        ("reviews for a product", "review", "ix_review_product_created",
+         select(Review).where(Review.product_id == 1).order_by(Review.id.desc()).limit(20)),
+        ("notifications page", "notification", "ix_notification_user_updated_id",
+         select(Notification).where(Notification.user_id == 1)
+         .order_by(Notification.updated_at.desc(), Notification.id.desc()).limit(20)),
+        ("notification coalescing lookup", "notification", "ix_notification_user_group_read",
+         select(Notification).where(Notification.user_id == 1, Notification.group_key == "interest:1",
+                                    Notification.is_read == False)),
+    ]
+
+
+def explain(statement):
+    """Return the database's query plan for a statement as one string."""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + sql).fetchall()
+    return "\n".join(" | ".join(str(col) for col in row) for row in rows)
+
+
+def uses_index(plan, table, index_name):
+    # SQLite names indexes backing UNIQUE constraints sqlite_autoindex_<table>_N
+    if index_name.startswith("uq_") and f"sqlite_autoindex_{table}_" in plan:
+        return True
+    return index_name in plan
+
+
+def check_hot_queries():
+    """Yield (name, expected index, plan, ok) for each hot query."""
+    for name, table, index_name, statement in hot_queries():
+        plan = explain(statement)
+        yield name, index_name, plan, uses_index(plan, table, index_name)
@@ -1,2 +1,4 @@
-from flask_bcrypt import Bcrypt
-bcrypt = Bcrypt()
+from app.cache import Cache
+from app.hashing import PasswordHasher
+cache = Cache()
+hasher = PasswordHasher()  # bcrypt on a process pool (app.hashing)
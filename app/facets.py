@@ -0,0 +1,51 @@
+import hashlib
+import json
+from flask import current_app
+from sqlalchemy import case, func
+from app.database import db
+from app.extensions import cache
+from app.models import Product
+
+
+FACETS_KEY = "facets:products"
+
+
+def get_facets():
+    """Category, color and condition facets with available-product counts, cached until a listing write."""
+    facets = cache.get(FACETS_KEY)
+    if facets is None:
+        facets = compute_facets()
+        cache.set(FACETS_KEY, facets, current_app.config.get("FACET_CACHE_TTL", 300))
+    return facets
+
+
+def invalidate_facets():
+    """Drop the cached facets; call after adding listings or changing stock."""
+    cache.delete(FACETS_KEY)
+
+
+def compute_facets():
+    """Build every facet from a single GROUP BY over the product table."""
+    available = func.sum(case((Product.quantity_available > 0, 1), else_=0))
+    rows = db.session.query(
+        Product.category, Product.color, Product.condition, available
+    ).group_by(Product.category, Product.color, Product.condition).all()
+
+    counts = {"categories": {}, "colors": {}, "conditions": {}}
+    for category, color, condition, n in rows:
+        n = int(n or 0)
+        _tally(counts["categories"], category, n)
+        _tally(counts["colors"], (color or "").strip().lower(), n)
+        _tally(counts["conditions"], condition, n)
+
+    facets = {
+        name: [{"value": value, "count": n} for value, n in sorted(values.items())]
+        for name, values in counts.items()
+    }
+    facets["etag"] = hashlib.sha1(json.dumps(facets, sort_keys=True).encode("utf-8")).hexdigest()
+    return facets
+
+
+def _tally(bucket, value, n):
+    if value:
+        bucket[value] = bucket.get(value, 0) + n
@@ -0,0 +1,134 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt as _bcrypt
+from flask import jsonify
+
+
+BCRYPT_MAX_BYTES = 72  # bcrypt only ever looked at this many bytes; newer releases refuse longer input
+
+
+class HashingOverloaded(RuntimeError):
+    """Raised when too many password hashes are already waiting for a worker."""
+
+
+def _encode(password):
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+def _hash(password, rounds):
+    return _bcrypt.hashpw(_encode(password), _bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, hashed):
+    try:
+        return _bcrypt.checkpw(_encode(password), hashed.encode("utf-8"))
+    except ValueError:
+        return False  # Not a bcrypt hash
+
+
+def cost_of(hashed):
+    """The work factor recorded in a bcrypt hash ("$2b$12$..." -> 12), or None."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Runs bcrypt in a process pool so logins don't hold request threads.
+
+    At most BCRYPT_MAX_PENDING hashes may be queued or running. A caller that
+    can't get a slot within BCRYPT_ADMISSION_TIMEOUT gets HashingOverloaded,
+    which the app answers with 503 and Retry-After. With BCRYPT_SYNC set (as in
+    tests) the work runs inline.
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.sync = True
+        self.workers = 1
+        self.max_pending = 1
+        self.admission_timeout = 0.5
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        self.sync = app.config.get("BCRYPT_SYNC", False)
+        self.workers = app.config.get("BCRYPT_WORKERS") or os.cpu_count() or 1
+        self.max_pending = app.config.get("BCRYPT_MAX_PENDING") or self.workers * 4
+        self.admission_timeout = app.config.get("BCRYPT_ADMISSION_TIMEOUT", 0.5)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.register_error_handler(HashingOverloaded, _overloaded_response)
+        if app.config.get("HASHING_METRICS_ENABLED"):
+            app.add_url_rule("/metrics/hashing", "hashing_metrics", lambda: jsonify(self.stats()))
+        app.extensions["hasher"] = self
+
+    def hash(self, password):
+        """bcrypt hash of password at the configured work factor."""
+        return self._run(_hash, password, self.rounds)
+
+    def check(self, password, hashed):
+        return bool(hashed) and self._run(_check, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """True when a stored hash was made with a different work factor than BCRYPT_LOG_ROUNDS."""
+        return cost_of(hashed) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            pending = self.pending
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": min(pending, self.workers),
+            "queue_depth": max(pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rounds": self.rounds,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, fn, *args):
+        if self.sync:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HashingOverloaded("Password hashing is saturated")
+        with self._lock:
+            self.pending += 1
+        try:
+            return self._pool().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Platform default start method: "spawn" would re-import __main__, which breaks
+                    # `python -m flask run`; forked workers only ever run the bcrypt functions above
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    atexit.register(self.shutdown)
+        return self._executor
+
+
+def _overloaded_response(error):
+    response = jsonify({"error": "The server is busy signing people in. Please try again in a moment."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, g, jsonify, make_response, request
+from flask_login import current_user
+from app.database import db
+from app.models import IdempotencyKey
+
+
+MAX_KEY_LENGTH = 64
+
+
+class DuplicateRequest(RuntimeError):
+    """Raised when another request claimed the same idempotency key first."""
+
+
+def idempotent(view):
+    """Make a JSON mutation safe to retry by sending an Idempotency-Key header.
+
+    The first request with a key runs the view; its response is stored and
+    every later request from that user with that key to that endpoint gets
+    it back without the view running again. The view claims the key with
+    claim_idempotency_key() inside the transaction that makes its change, so
+    the key is recorded exactly when the change is. Requests without the
+    header are unaffected.
+
+    A key whose response was never stored, because the worker died between
+    the commit and storing it, is held for IDEMPOTENCY_LEASE_SECONDS. Retries
+    in that time get 409. After that one retry reclaims the key and runs the
+    view again, rather than every retry getting 409 until the key is pruned.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        client_key = request.headers.get("Idempotency-Key")
+        if not client_key:
+            return view(*args, **kwargs)
+        if len(client_key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"Idempotency-Key may be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        key_id = f"{current_user.id}:{request.endpoint}:{client_key}"
+        stored = db.session.get(IdempotencyKey, key_id)
+        if stored is not None and not _reclaim_lapsed(stored):
+            return _replay(db.session.get(IdempotencyKey, key_id))
+
+        g.idempotency_key = key_id
+        try:
+            response = make_response(view(*args, **kwargs))
+        except DuplicateRequest:
+            return _replay(db.session.get(IdempotencyKey, key_id))
+        finally:
+            g.pop("idempotency_key", None)
+
+        if g.pop("idempotency_claimed", False):
+            IdempotencyKey.query.filter_by(id=key_id).update(
+                {IdempotencyKey.status_code: response.status_code,
+                 IdempotencyKey.response_body: response.get_data(as_text=True)},
+                synchronize_session=False,
+            )
+            db.session.commit()
+        return response
+
+    return wrapper
+
+
+def claim_idempotency_key():
+    """Add the current request's key to the open transaction; does nothing for requests without one."""
+    key_id = g.get("idempotency_key")
+    if key_id:
+        db.session.add(IdempotencyKey(id=key_id, user_id=current_user.id))
+        g.idempotency_claimed = True
+
+
+def raise_if_key_taken():
+    """After an IntegrityError was rolled back: raise DuplicateRequest if it was our key that collided."""
+    key_id = g.get("idempotency_key")
+    if key_id and db.session.get(IdempotencyKey, key_id) is not None:
+        raise DuplicateRequest(key_id)
+
+
+def prune_idempotency_keys(now=None):
+    """Delete keys older than IDEMPOTENCY_KEY_TTL_HOURS; the caller commits. Returns how many went."""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=current_app.config.get("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+    return IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+
+
+def _reclaim_lapsed(stored):
+    """Delete a key whose response was never stored once its lease ran out; True if this request got it."""
+    lease = timedelta(seconds=current_app.config.get("IDEMPOTENCY_LEASE_SECONDS", 30))
+    if stored.status_code is not None or stored.created_at is None or stored.created_at > datetime.utcnow() - lease:
+        return False
+    # Conditional, so of several retries racing for a lapsed key only one runs the view again
+    deleted = IdempotencyKey.query.filter(
+        IdempotencyKey.id == stored.id, IdempotencyKey.status_code.is_(None),
+        IdempotencyKey.created_at == stored.created_at,
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted == 1
+
+
+def _replay(stored):
+    if stored is None or stored.status_code is None:
+        response = jsonify({"error": "A request with this Idempotency-Key is still being processed"})
+        response.status_code = 409
+        response.headers["Retry-After"] = "1"
+        return response
+    response = current_app.response_class(stored.response_body, status=stored.status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
@@ -0,0 +1,85 @@
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from app.database import db
+from app.storage import storage
+from app.response_cache import invalidate_product
+
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest edge in pixels, smallest first
+VARIANTS = {"thumb": 160, "card": 480, "detail": 1200}
+JPEG_QUALITY = 82
+
+
+def make_variants(source_path):
+    """Store resized, metadata-free JPEG variants of an image and return {name: {file, width, height}}.
+
+    Variants go into the content-addressed store, so identical outputs share a
+    file and a key never points at different content.
+    """
+    from PIL import Image, ImageOps
+
+    variants = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)  # Apply the camera rotation before EXIF is dropped
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for name, edge in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            resized.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            key = storage.put_bytes(buffer.getvalue(), "jpg")
+            variants[name] = {"file": key, "width": resized.width, "height": resized.height}
+    return variants
+
+
+class ImagePipeline:
+    """Generates product image variants on a background worker pool.
+
+    With IMAGE_PROCESSING_SYNC set (as in tests) the work runs inline instead.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+
+    def init_app(self, app):
+        self.app = app
+        if not app.config.get("IMAGE_PROCESSING_SYNC"):
+            self.executor = ThreadPoolExecutor(
+                max_workers=app.config.get("IMAGE_WORKERS", 2), thread_name_prefix="image-pipeline"
+            )
+        app.extensions["images"] = self
+
+    def submit(self, product_id, source_path):
+        """Queue variant generation for a product's freshly saved upload."""
+        if self.executor is None:
+            return self._process(product_id, source_path)
+        return self.executor.submit(self._process, product_id, source_path)
+
+    def _process(self, product_id, source_path):
+        from app.models import Product
+
+        with self.app.app_context():
+            try:
+                variants = make_variants(source_path)
+                Product.query.filter_by(id=product_id).update(
+                    {Product.image_variants: json.dumps(variants)}, synchronize_session=False
+                )
+                db.session.commit()
+                invalidate_product(product_id)
+                return variants
+            except Exception:
+                db.session.rollback()
+                logger.exception("Image processing failed for product %s", product_id)
+            finally:
+                db.session.remove()
+
+
+images = ImagePipeline()
@@ -1,6 +1,11 @@
 from flask import Blueprint, jsonify,request,render_template,redirect,url_for,flash
 from flask_login import login_required, current_user
 from app.models import db, Interest, Product
+from app.counters import adjust_interest_count
+from app.queries import shaped
+from app.response_cache import invalidate_product
+from app.trending import trending
+from app.notifier import notifier
 
 interest = Blueprint('interest', __name__)
 
@@ -13,40 +18,60 @@ def toggle_interest(product_id):
 
     # 🚨 Prevent users from marking interest in their own product
     if product.user_id == current_user.id:
-        return render_template("message.html", message="❌ You cannot express interest in your own product.")
+        return _interest_response(product, False, "❌ You cannot express interest in your own product.", success=False)
 
     interest = Interest.query.filter_by(user_id=current_user.id, product_id=product_id).first()
 
+    # Interest row and counter are committed together; the seller's notification is queued afterwards
     if interest:
         db.session.delete(interest)
+        adjust_interest_count(product_id, -1)
         db.session.commit()
-        return render_template("message.html", message="💔 Interest removed.")
-    else:
-        new_interest = Interest(user_id=current_user.id, product_id=product_id)
-        db.session.add(new_interest)
-        db.session.commit()
+        invalidate_product(product_id)  # Trending keeps the original event; re-interest won't count again
+        return _interest_response(product, False, "💔 Interest removed.")
 
-        # ✅ Send notification to seller
-        notification = Notification(
-            user_id=product.user_id,  # Seller receives the notification
-            message=f"{current_user.username} is interested in your product: {product.name}",
-            link=url_for("products.product_detail", product_id=product_id),
-        )
-        db.session.add(notification)
-        db.session.commit()
+    db.session.add(Interest(user_id=current_user.id, product_id=product_id))
+    adjust_interest_count(product_id, 1)
+    db.session.commit()
+    invalidate_product(product_id)
+    trending.record(product_id, "interest", actor_id=current_user.id)
+
+    # ✅ Send notification to seller; repeat interest in the same product folds into one row
+    notifier.notify(
+        product.user_id,
+        f"{current_user.username} is interested in your product: {product.name}",
+        link=url_for("products.product_detail", product_id=product_id),
+        group_key=f"interest:{product_id}",
+        group_message=f"{{count}} people are interested in your product: {product.name}",
+        actor_id=current_user.id,
+    )
 
-        return render_template("message.html", message="❤️ Interest added. Seller has been notified.")
+    return _interest_response(product, True, "❤️ Interest added. Seller has been notified.")
+
+
+def _interest_response(product, interested, message, success=True):
+    """Answer fetch() callers with JSON and plain form posts with a redirect."""
+    if request.accept_mimetypes.best == "text/html":
+        flash(message, "success" if success else "danger")
+        return redirect(url_for("interest.get_interested_products"))
+
+    return jsonify({
+        "success": success,
+        "interested": interested,
+        "interest_count": product.interested_count,
+        "message": message
+    }), 200 if success else 403
 
 @interest.route("/interest/count/<int:product_id>", methods=["GET"])
 def get_interest_count(product_id):
-    # Count how many users are interested in the given product
-    interest_count = Interest.query.filter_by(product_id=product_id).count()
-    return jsonify({"interest_count": interest_count}), 200
+    # Served from the stored counter maintained by toggle_interest
+    product = Product.query.get_or_404(product_id)
+    return jsonify({"interest_count": product.interested_count}), 200
 
 @interest.route("/interest", methods=["GET"])
 @login_required
 def get_interested_products():
-    interested_products = Interest.query.filter_by(user_id=current_user.id).all()
+    interested_products = shaped(Interest.query).filter_by(user_id=current_user.id).all()
     
     # Extract product details
     products = [interest.product for interest in interested_products]
@@ -59,12 +84,12 @@ def my_listings():
     # Fetch products that the current user has listed
     products = Product.query.filter_by(user_id=current_user.id).all()
 
-    # Count interested users for each product
+    # Interest counts come from the stored counter, no per-product COUNT
     listings = [{
         "id": product.id,
         "name": product.name,
         "price": product.price,
-        "interest_count": Interest.query.filter_by(product_id=product.id).count()
+        "interest_count": product.interested_count
     } for product in products]
 
     return render_template("my_listings.html", listings=listings)
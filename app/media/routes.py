@@ -0,0 +1,24 @@
+import os
+from flask import Blueprint, abort, send_file
+from app.storage import storage, digest_of
+
+media = Blueprint('media', __name__)
+
+ONE_YEAR = 365 * 24 * 3600
+
+
+@media.route('/media/<path:key>', methods=['GET'])
+def serve_media(key):
+    """Serve a stored file. Keys are content hashes, so responses never change and may be cached forever."""
+    digest = digest_of(key)
+    if not digest:
+        abort(404)
+
+    path = storage.path(key)
+    if not os.path.exists(path):
+        abort(404)
+
+    response = send_file(path, etag=digest, max_age=ONE_YEAR, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -1,22 +1,58 @@
-from flask import Blueprint, request, jsonify, render_template
+import json
+import time
+from flask import Blueprint, request, jsonify, render_template, Response, current_app
 from flask_login import login_required, current_user
 from app import db
-from app.models import Message, User
+from app.models import Message, Product, User
+from app.pubsub import hub, user_channel
+from app.unread import unread_count_for, message_received, messages_read
+from app.pagination import keyset_page, page_size, InvalidCursor
+from app.trending import trending
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import aliased
 
 messages = Blueprint('messages', __name__)
 
+INBOX_PREVIEW_LENGTH = 80
+
+
+def conversation_query(user_id, peer_id):
+    """Messages exchanged between two users; each direction is served by ix_message_sender_receiver_id."""
+    return Message.query.filter(
+        ((Message.sender_id == user_id) & (Message.receiver_id == peer_id)) |
+        ((Message.sender_id == peer_id) & (Message.receiver_id == user_id))
+    )
+
+
+def conversation_page(user_id, peer_id, since_id=None, before_id=None, limit=None):
+    """One page of a conversation in chronological order, plus whether more rows lie beyond it.
+
+    since_id returns the oldest messages newer than it (catching up); otherwise the
+    newest messages older than before_id, or the latest page when neither is given.
+    """
+    limit = page_size(limit, default=current_app.config.get("MESSAGE_PAGE_SIZE", 50))
+    query = conversation_query(user_id, peer_id)
+
+    if since_id is not None:
+        rows = query.filter(Message.id > since_id).order_by(Message.id.asc()).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    rows = query.order_by(Message.id.desc()).limit(limit + 1).all()
+    return list(reversed(rows[:limit])), len(rows) > limit
+
 @messages.route('/chat/<int:seller_id>', methods=['GET'])
 @login_required
 def chat(seller_id):
     """Render the chat interface with message history."""
     seller = User.query.get_or_404(seller_id)
 
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.receiver_id == seller_id)) |
-        ((Message.sender_id == seller_id) & (Message.receiver_id == current_user.id))
-    ).order_by(Message.timestamp).all()
+    # Only the latest page is rendered; older messages are fetched with before_id on scroll
+    messages, has_older = conversation_page(current_user.id, seller_id)
 
-    return render_template('chat.html', seller=seller, messages=messages)
+    return render_template('chat.html', seller=seller, messages=messages, has_older=has_older,
+                           product_id=request.args.get('product_id', type=int))
 
 
 @messages.route("/send_message", methods=["POST"])
@@ -42,35 +78,130 @@ def send_message():
     if not receiver:
         return jsonify({"error": "Receiver does not exist!"}), 404
 
+    # Opening a conversation from a seller's product page counts towards that product's trending score
+    product_id = data.get("product_id")
+    chat_start = isinstance(product_id, int) and not db.session.query(
+        conversation_query(current_user.id, receiver_id).exists()
+    ).scalar()
+
     new_message = Message(sender_id=current_user.id, receiver_id=receiver_id, message=message_text)
     db.session.add(new_message)
     db.session.commit()
+    message_received(receiver_id)
+
+    if chat_start and Product.query.filter_by(id=product_id, user_id=receiver_id).first():
+        trending.record(product_id, "chat_start")
+
+    # Push to both participants' open streams
+    payload = message_payload(new_message, current_user.username)
+    hub.publish(user_channel(receiver_id), payload)
+    hub.publish(user_channel(current_user.id), payload)
+
+    return jsonify({"success": True, "message": "Message sent successfully!", "id": new_message.id}), 201
+
+
+def message_payload(msg, sender_username):
+    """Broker payload for one chat message."""
+    return {
+        "id": msg.id,
+        "sender_id": msg.sender_id,
+        "receiver_id": msg.receiver_id,
+        "sender_username": sender_username,
+        "message": msg.message,
+        "is_read": msg.is_read,
+        "timestamp": msg.timestamp.isoformat() if msg.timestamp else None
+    }
+
+
+@messages.route('/stream/<int:receiver_id>', methods=['GET'])
+@login_required
+def stream_messages(receiver_id):
+    """Server-Sent Events stream of new messages in the conversation with receiver_id."""
+    user_id = current_user.id
+    # Subscribe before reading the backlog so nothing sent in between is missed
+    subscription = hub.subscribe(user_channel(user_id))
+
+    try:
+        # Replay anything sent since the client's last seen message (reconnects send Last-Event-ID)
+        after_id = request.headers.get("Last-Event-ID", type=int) or request.args.get("after_id", type=int)
+        backlog = []
+        if after_id is not None:
+            peer = User.query.get(receiver_id)
+            backlog = [
+                message_payload(msg, current_user.username if msg.sender_id == user_id else peer.username)
+                for msg in conversation_query(user_id, receiver_id).filter(Message.id > after_id).order_by(Message.id).all()
+            ] if peer else []
+        db.session.remove()  # Don't hold a pooled connection for the life of the stream
+    except Exception:
+        subscription.close()
+        raise
 
-    return jsonify({"success": True, "message": "Message sent successfully!"}), 201
+    heartbeat = current_app.config.get("CHAT_STREAM_HEARTBEAT", 15)
+    deadline = time.monotonic() + current_app.config.get("CHAT_STREAM_MAX_SECONDS", 300)
+
+    def events():
+        last_id = after_id or 0
+        yield "retry: 3000\n\n"
+        for payload in backlog:
+            last_id = payload["id"]
+            yield sse_event(payload, user_id)
+
+        while time.monotonic() < deadline:
+            payload = subscription.get(timeout=heartbeat)
+            if payload is None:
+                yield ": keep-alive\n\n"
+                continue
+            if receiver_id not in (payload["sender_id"], payload["receiver_id"]) or payload["id"] <= last_id:
+                continue
+            last_id = payload["id"]
+            yield sse_event(payload, user_id)
+
+    response = Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Stop nginx from buffering the stream
+    })
+    # The server closes the response when the stream ends or the client goes away, even before it started
+    response.call_on_close(subscription.close)
+    return response
+
+
+def sse_event(payload, user_id):
+    """Format a message payload as an SSE `message` event for user_id."""
+    data = dict(payload, sender="You" if payload["sender_id"] == user_id else payload["sender_username"])
+    return f"id: {payload['id']}\nevent: message\ndata: {json.dumps(data)}\n\n"
 
 
 
 @messages.route('/<int:receiver_id>', methods=['GET'])
 @login_required
 def get_messages(receiver_id):
-    """Fetch messages and count unread messages."""
-    
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.receiver_id == receiver_id)) |
-        ((Message.sender_id == receiver_id) & (Message.receiver_id == current_user.id))
-    ).order_by(Message.timestamp).all()
+    """Fetch a page of messages and count unread messages.
 
-    unread_count = Message.query.filter_by(receiver_id=current_user.id, is_read=False).count()
+    `since_id` returns only messages newer than the client's last one; `before_id`
+    scrolls back through older history. Both are capped at `limit` rows.
+    """
+    peer = User.query.get_or_404(receiver_id)
+    messages, has_more = conversation_page(
+        current_user.id, receiver_id,
+        since_id=request.args.get("since_id", type=int),
+        before_id=request.args.get("before_id", type=int),
+        limit=request.args.get("limit", type=int),
+    )
+
+    unread_count = unread_count_for(current_user.id)
 
     return jsonify({
         "messages": [
             {
-                "sender": "You" if msg.sender_id == current_user.id else User.query.get(msg.sender_id).username,
+                "id": msg.id,
+                "sender_id": msg.sender_id,
+                "sender": "You" if msg.sender_id == current_user.id else peer.username,
                 "message": msg.message,
                 "is_read": msg.is_read
             }
             for msg in messages
         ],
+        "has_more": has_more,
         "unread_count": unread_count  # ✅ Include unread message count
     })
 
@@ -79,43 +210,75 @@ def get_messages(receiver_id):
 def mark_messages_read(sender_id):
     """Mark all messages from a sender as read."""
     
-    Message.query.filter_by(sender_id=sender_id, receiver_id=current_user.id, is_read=False).update({"is_read": True})
+    marked = Message.query.filter_by(sender_id=sender_id, receiver_id=current_user.id, is_read=False).update({"is_read": True})
     db.session.commit()
+    messages_read(current_user.id, marked)
     
     return jsonify({"success": True, "message": "Messages marked as read"})
 @messages.route('/history', methods=['GET'])
 @login_required
 def get_message_history():
-    """Return a list of chat conversations"""
-    
-    # Find all distinct users the current user has messaged with
-    sent_users = db.session.query(Message.receiver_id).filter(Message.sender_id == current_user.id)
-    received_users = db.session.query(Message.sender_id).filter(Message.receiver_id == current_user.id)
-
-    # Get unique user IDs from sent and received messages
-    user_ids = set(user_id for (user_id,) in sent_users.union(received_users).all())
-
-    chats = []
-    for user_id in user_ids:
-        user = User.query.get(user_id)
-        
-        # Count unread messages from this user
-        unread_count = Message.query.filter_by(sender_id=user_id, receiver_id=current_user.id, is_read=False).count()
-        
-        chats.append({
-            "user_id": user_id,
-            "username": user.username,
-            "unread_count": unread_count
-        })
-
-    return jsonify({"chats": chats})
+    """Return the user's conversations, most recent first, in one aggregated query per page.
+
+    Each row carries the peer's username, the last message preview and time,
+    and the number of unread messages from that peer.
+    """
+    me = current_user.id
+    peer_id = case((Message.sender_id == me, Message.receiver_id), else_=Message.sender_id)
+
+    summary = db.session.query(
+        peer_id.label("peer_id"),
+        func.max(Message.id).label("last_id"),
+        func.sum(case(((Message.receiver_id == me) & (Message.is_read == False), 1), else_=0)).label("unread")
+    ).filter(
+        or_(Message.sender_id == me, Message.receiver_id == me)
+    ).group_by(peer_id).subquery()
+
+    last_message = aliased(Message)
+    query = db.session.query(
+        summary.c.peer_id,
+        summary.c.last_id,
+        summary.c.unread,
+        User.username,
+        last_message.message,
+        last_message.timestamp
+    ).join(last_message, last_message.id == summary.c.last_id).join(User, User.id == summary.c.peer_id)
+
+    try:
+        rows, next_cursor = keyset_page(
+            query, summary.c.last_id, summary.c.peer_id, True,
+            cursor=request.args.get("cursor"),
+            limit=page_size(request.args.get("limit", type=int)),
+            tag="inbox",
+        )
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    chats = [{
+        "user_id": row.peer_id,
+        "username": row.username,
+        "unread_count": int(row.unread or 0),
+        "last_message_id": row.last_id,
+        "last_message": row.message[:INBOX_PREVIEW_LENGTH],
+        "last_timestamp": row.timestamp.isoformat() if row.timestamp else None
+    } for row in rows]
+
+    return jsonify({"chats": chats, "next_cursor": next_cursor})
 
 @messages.route('/unread_count', methods=['GET'])
 @login_required
 def get_unread_count():
-    """Get the count of unread messages for the current user."""
-    unread_count = Message.query.filter_by(receiver_id=current_user.id, is_read=False).count()
-    return jsonify({"unread_count": unread_count})
+    """Get the count of unread messages for the current user.
+
+    Served from the cached per-user counter; the ETag lets an unchanged badge
+    poll be answered with an empty 304.
+    """
+    unread_count = unread_count_for(current_user.id)
+
+    response = jsonify({"unread_count": unread_count})
+    response.set_etag(f"unread-{current_user.id}-{unread_count}")
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
 @messages.route("/messages")
 @login_required
 def inbox():
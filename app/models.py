@@ -1,7 +1,9 @@
 from flask_login import UserMixin
 from app.database import db
-from app.extensions import bcrypt  # ✅ Import bcrypt from extensions
+from app.extensions import hasher  # ✅ Password hashing runs on the hasher's process pool
+from app.storage import media_url
 from datetime import datetime
+import json
 
 class User(db.Model, UserMixin):
     """User model handling authentication and user details."""
@@ -17,17 +19,35 @@ class User(db.Model, UserMixin):
 
     def set_password(self, password):
         """Hashes and stores user password."""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
         """Checks the hashed password."""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return hasher.check(password, self.password_hash)
+
+    def rehash_password_if_needed(self, password):
+        """Re-hash a just-verified password when BCRYPT_LOG_ROUNDS has changed; returns True if updated."""
+        if not hasher.needs_rehash(self.password_hash):
+            return False
+        self.set_password(password)
+        return True
 
     def __repr__(self):
         return f"<User {self.username}>"
 
 class Product(db.Model):
     """Product model storing product details."""
+    __table_args__ = (
+        # (sort key, id) indexes backing keyset pagination in products.routes
+        db.Index("ix_product_price_id", "price", "id"),
+        db.Index("ix_product_created_at_id", "created_at", "id"),
+        db.Index("ix_product_interested_count_id", "interested_count", "id"),
+        db.Index("ix_product_rating_bayes_id", "rating_bayes", "id"),
+        # Category-filtered listings, in id or price order
+        db.Index("ix_product_category_price_id", "category", "price", "id"),
+        db.Index("ix_product_user_id", "user_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     category = db.Column(db.String(100), nullable=False)
@@ -37,22 +57,56 @@ class Product(db.Model):
     quantity_available = db.Column(db.Integer, nullable=False)
     condition = db.Column(db.String(20), nullable=False)
     image = db.Column(db.String(255), default='nb.png')  # Default image
+    image_variants = db.Column(db.Text)  # JSON {name: {file, width, height}} written by app.images
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    interested_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # Maintained by app.counters
+
+    # Review aggregates, maintained by app.counters.adjust_rating alongside each review write
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_bayes = db.Column(db.Float, nullable=False, default=0.0, server_default="0")  # Average shrunk towards the prior
 
     # Foreign Key linking to User table
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     # Relationship with Interest Model
     interests = db.relationship('Interest', backref='product', lazy="dynamic")
-    
-    @property
-    def interested_count(self):
-        """Dynamically calculate interest count instead of using a static field."""
-        return self.interests.count()
 
     def __repr__(self):
         return f"<Product {self.name} - {self.category}>"
 
+    @property
+    def variants(self):
+        """Processed image variants, smallest first; empty until the image pipeline has run."""
+        if not self.image_variants:
+            return {}
+        variants = json.loads(self.image_variants)
+        return dict(sorted(variants.items(), key=lambda item: item[1]["width"]))
+
+    def image_for(self, width):
+        """Filename of the smallest variant at least `width` px wide, falling back to the original upload."""
+        variants = list(self.variants.values())
+        for variant in variants:
+            if variant["width"] >= width:
+                return variant["file"]
+        if variants:
+            return variants[-1]["file"]
+        return self.image or 'nb.png'
+
+    @property
+    def rating_average(self):
+        """Plain mean star rating, or None without reviews."""
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
+
+    @property
+    def rating_histogram(self):
+        return {stars: getattr(self, f"rating_{stars}") or 0 for stars in range(1, 6)}
+
     def serialize(self):
         """Serialize product details for API response."""
         return {
@@ -60,11 +114,43 @@ class Product(db.Model):
             "name": self.name,
             "price": self.price,
             "image_filename": self.image,
-            "interested_count": self.interested_count
+            "image_variants": {name: v["file"] for name, v in self.variants.items()},
+            "image_url": media_url(self.image_for(480)),
+            "interested_count": self.interested_count,
+            "rating": {
+                "count": self.rating_count,
+                "average": self.rating_average,
+                "bayesian": round(self.rating_bayes, 3) if self.rating_count else None,
+                "histogram": self.rating_histogram,
+            }
         }
 
+class ProductImage(db.Model):
+    """Extra images attached to a listing, in display order."""
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
+    image = db.Column(db.String(255), nullable=False)  # Storage key (see app.storage)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    product = db.relationship("Product", backref=db.backref("gallery", order_by="ProductImage.position", lazy=True))
+
+class TrendingScore(db.Model):
+    """One worker's last persisted share of a product's trending score (see app.trending)."""
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    worker = db.Column(db.String(64), primary_key=True, default="")
+    score = db.Column(db.Float, nullable=False, default=0.0)  # Decayed to computed_at
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Message(db.Model):
     """Message model for user communication."""
+    __table_args__ = (
+        # Serves both directions of a conversation and since_id/before_id range scans
+        db.Index("ix_message_sender_receiver_id", "sender_id", "receiver_id", "id"),
+        # Unread counts, overall and per sender
+        db.Index("ix_message_receiver_read_sender", "receiver_id", "is_read", "sender_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -78,10 +164,19 @@ class Message(db.Model):
 
 class Cart(db.Model):
     """Cart model for storing items in user cart."""
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "product_id", name="uq_cart_user_product"),
+        # Finding lapsed holds, for one product and across the table (see app.reservations)
+        db.Index("ix_cart_product_reserved", "product_id", "reserved_until"),
+        db.Index("ix_cart_reserved_until", "reserved_until"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
+    # While set, `quantity` is held: taken out of the product's stock until this time
+    reserved_until = db.Column(db.DateTime, nullable=True)
 
     # Define relationship with Product
     product = db.relationship("Product", backref="cart_items")
@@ -94,11 +189,17 @@ class Cart(db.Model):
             "product_id": self.product_id,
             "product_name": self.product.name,
             "price": self.product.price,
-            "quantity": self.quantity
+            "quantity": self.quantity,
+            "reserved_until": self.reserved_until.strftime("%Y-%m-%d %H:%M:%S") if self.reserved_until else None,
         }
 
 class Interest(db.Model):
     """Model to track user interests in a product."""
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "product_id", name="uq_interest_user_product"),
+        db.Index("ix_interest_product_id", "product_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -117,6 +218,10 @@ class Interest(db.Model):
 
 class Review(db.Model):
     """Review model for product reviews."""
+    __table_args__ = (
+        db.Index("ix_review_product_created", "product_id", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -140,9 +245,40 @@ class Review(db.Model):
 
 
 class Notification(db.Model):
+    __table_args__ = (
+        # Newest-activity-first listing and the coalescing lookup in app.notifier
+        db.Index("ix_notification_user_updated_id", "user_id", "updated_at", "id"),
+        db.Index("ix_notification_user_group_read", "user_id", "group_key", "is_read"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message = db.Column(db.String(255), nullable=False)
     link = db.Column(db.String(255), nullable=True)  # Optional: Link to chat or product
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    group_key = db.Column(db.String(120), nullable=True)  # Unread notifications with the same key coalesce
+    count = db.Column(db.Integer, nullable=False, default=1, server_default="1")  # Events folded into this row
+    actor_ids = db.Column(db.Text, nullable=True)  # Comma-separated users already counted in `count`
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def serialize(self):
+        """Serialize notification for API response."""
+        return {
+            "id": self.id,
+            "message": self.message,
+            "link": self.link,
+            "count": self.count,
+            "is_read": bool(self.is_read),
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S") if self.updated_at else None,
+        }
+
+
+class IdempotencyKey(db.Model):
+    """A client-supplied Idempotency-Key and the response its first request got, replayed for retries."""
+    id = db.Column(db.String(160), primary_key=True)  # "<user id>:<endpoint>:<client key>"
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)  # Unset while the first request is still running
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,64 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import login_required, current_user
+from app.database import db
+from app.models import Notification
+from app.notifier import unread_notification_count, notifications_read
+from app.pagination import keyset_page, page_size, InvalidCursor
+
+notifications = Blueprint('notifications', __name__)
+
+
+@notifications.route('/notifications', methods=['GET'])
+@login_required
+def list_notifications():
+    """The current user's notifications, most recent activity first, one page at a time."""
+    query = Notification.query.filter_by(user_id=current_user.id)
+    if request.args.get('unread') == '1':
+        query = query.filter_by(is_read=False)
+
+    try:
+        items, next_cursor = keyset_page(
+            query, Notification.updated_at, Notification.id, True,
+            cursor=request.args.get('cursor'),
+            limit=page_size(request.args.get('limit', type=int), current_app.config.get('NOTIFICATION_PAGE_SIZE', 20)),
+            tag="notifications",
+        )
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "notifications": [n.serialize() for n in items],
+        "unread_count": unread_notification_count(current_user.id),
+        "next_cursor": next_cursor,
+    })
+
+
+@notifications.route('/notifications/unread_count', methods=['GET'])
+@login_required
+def notification_unread_count():
+    """Unread notification badge, from the cached counter; unchanged polls get a 304."""
+    count = unread_notification_count(current_user.id)
+    response = jsonify({"unread_count": count})
+    response.set_etag(f"notif-unread-{current_user.id}-{count}")
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+@notifications.route('/notifications/mark_read', methods=['POST'])
+@login_required
+def mark_notifications_read():
+    """Mark the given notification ids, or all of them with {"all": true}, as read in one UPDATE."""
+    data = request.get_json(silent=True) or {}
+    query = Notification.query.filter_by(user_id=current_user.id, is_read=False)
+
+    if not data.get("all"):
+        ids = data.get("ids")
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return jsonify({"error": "Send a list of notification ids or all=true"}), 400
+        query = query.filter(Notification.id.in_(ids))
+
+    updated = query.update({Notification.is_read: True}, synchronize_session=False)
+    db.session.commit()
+    notifications_read(current_user.id, updated)
+
+    return jsonify({"success": True, "marked_read": updated})
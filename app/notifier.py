@@ -0,0 +1,177 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from app.database import db
+from app.unread import cached_count, invalidate_count
+
+
+logger = logging.getLogger(__name__)
+
+
+class PendingNotification:
+    """One queued notification; group_message (with a {count} field) replaces message once several coalesce.
+
+    actor_id is who caused it; a coalesced row counts each actor once.
+    """
+
+    __slots__ = ("user_id", "message", "link", "group_key", "group_message", "actor_id", "created_at")
+
+    def __init__(self, user_id, message, link=None, group_key=None, group_message=None, actor_id=None):
+        self.user_id = user_id
+        self.message = message
+        self.link = link
+        self.group_key = group_key
+        self.group_message = group_message
+        self.actor_id = actor_id
+        self.created_at = datetime.utcnow()
+
+
+class Notifier:
+    """Queues notifications and writes them in batches from a background thread.
+
+    Notifications sharing a group_key for the same user coalesce into that
+    user's unread row for the key: its count goes up and its text switches to
+    group_message, so five interested buyers are one row rather than five.
+    Notifications carrying an actor_id count once per actor, so a buyer
+    toggling interest off and on is still one interested person.
+    With NOTIFICATIONS_SYNC set (as in tests) each notification is written
+    immediately instead.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.sync = True
+        self._queue = None
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.sync = app.config.get("NOTIFICATIONS_SYNC", False)
+        self.batch_size = app.config.get("NOTIFICATION_BATCH_SIZE", 200)
+        self.flush_seconds = app.config.get("NOTIFICATION_FLUSH_SECONDS", 1.0)
+        if not self.sync:
+            self._queue = queue.Queue(maxsize=app.config.get("NOTIFICATION_QUEUE_SIZE", 10000))
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+            atexit.register(self.drain)
+        app.extensions["notifier"] = self
+
+    def notify(self, user_id, message, link=None, group_key=None, group_message=None, actor_id=None):
+        """Queue a notification for user_id; call after the triggering change is committed."""
+        item = PendingNotification(user_id, message, link, group_key, group_message, actor_id)
+        if self.sync:
+            self.write([item])
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning("Notification queue full; writing inline")
+            self.write([item])
+
+    def drain(self):
+        """Write everything still queued (used at shutdown)."""
+        batch = []
+        while self._queue is not None:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._flush(batch)
+
+    def write(self, batch):
+        """Coalesce and store a batch of pending notifications in one transaction."""
+        from app.models import Notification
+
+        grouped = {}
+        for item in batch:
+            key = (item.user_id, item.group_key) if item.group_key else (item.user_id, id(item))
+            grouped.setdefault(key, []).append(item)
+
+        # Unread rows these groups can fold into, fetched in one query
+        group_keys = {item.group_key for item in batch if item.group_key}
+        existing = {}
+        if group_keys:
+            for row in Notification.query.filter(
+                Notification.user_id.in_({item.user_id for item in batch}),
+                Notification.group_key.in_(group_keys),
+                Notification.is_read == False,
+            ).all():
+                existing[(row.user_id, row.group_key)] = row
+
+        now = datetime.utcnow()
+        new_rows = set()  # users given a new unread row
+        for key, items in grouped.items():
+            last = items[-1]
+            row = existing.get(key)
+            if row is None:
+                row = Notification(
+                    user_id=last.user_id, group_key=last.group_key, count=0,
+                    link=last.link, created_at=items[0].created_at,
+                )
+                db.session.add(row)
+                new_rows.add(last.user_id)
+            actors = set(filter(None, (row.actor_ids or "").split(",")))
+            added = 0
+            for item in items:
+                if item.actor_id is None:
+                    added += 1
+                elif str(item.actor_id) not in actors:
+                    actors.add(str(item.actor_id))
+                    added += 1
+            if not added:
+                continue  # Everyone here is already counted in this unread row
+            row.actor_ids = ",".join(sorted(actors, key=int)) or None
+            row.count = (row.count or 0) + added
+            row.message = last.group_message.replace("{count}", str(row.count)) if row.count > 1 and last.group_message else last.message
+            row.updated_at = now
+        db.session.commit()
+
+        for user_id in new_rows:
+            invalidate_count("notif-unread", user_id)
+        return len(grouped)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            try:
+                self.write(batch)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Writing %d notification(s) failed", len(batch))
+            finally:
+                db.session.remove()
+
+
+notifier = Notifier()
+
+
+def unread_notification_count(user_id):
+    """Unread notification rows for a user, served from the cache and recounted after writes."""
+    from app.models import Notification
+
+    return cached_count(
+        "notif-unread", user_id, lambda: Notification.query.filter_by(user_id=user_id, is_read=False).count()
+    )
+
+
+def notifications_read(user_id, count):
+    """Outdate a user's cached counter after `count` notifications were marked read."""
+    if count:
+        invalidate_count("notif-unread", user_id)
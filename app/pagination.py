@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded or belongs to another ordering."""
+
+
+def encode_cursor(payload):
+    """Pack a cursor payload into an opaque URL-safe token."""
+    raw = json.dumps(payload, separators=(",", ":"), default=_encode_value).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Unpack a token produced by encode_cursor()."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+
+
+def page_size(requested, default=DEFAULT_PAGE_SIZE):
+    """Clamp a client-supplied page size to a sane range."""
+    if not requested or requested <= 0:
+        return default
+    return min(requested, MAX_PAGE_SIZE)
+
+
+def keyset_page(query, column, tiebreak, descending, cursor=None, limit=DEFAULT_PAGE_SIZE, tag=None):
+    """Return one page of `query` ordered by (column, tiebreak) plus the cursor for the next page.
+
+    The next page is selected with a range predicate on the sort key, so every
+    page is an index range scan of `limit + 1` rows no matter how deep it is.
+    `tag` names the ordering; cursors minted for another ordering are rejected.
+    """
+    if cursor:
+        state = decode_cursor(cursor)
+        if not isinstance(state, dict) or state.get("s") != tag or "k" not in state:
+            raise InvalidCursor("Cursor does not match this ordering")
+        value, last_id = _cursor_key(state)
+
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, tiebreak < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, tiebreak > last_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), tiebreak.desc())
+    else:
+        query = query.order_by(column.asc(), tiebreak.asc())
+
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        value = getattr(last, column.key)
+        state = {"s": tag, "k": [value, getattr(last, tiebreak.key)]}
+        if isinstance(value, datetime):
+            state["t"] = "datetime"
+        next_cursor = encode_cursor(state)
+
+    return items, next_cursor
+
+
+def _cursor_key(state):
+    """The (sort value, tiebreak id) a cursor resumes after; InvalidCursor unless both are well-formed."""
+    key = state["k"]
+    if not isinstance(key, list) or len(key) != 2:
+        raise InvalidCursor("Malformed cursor")
+    value, last_id = key
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise InvalidCursor("Malformed cursor")
+    if "t" in state:
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor("Malformed cursor")
+    return value, last_id
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
@@ -1,19 +1,89 @@
-import os
 from flask import Blueprint, jsonify, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
-from app.models import db, Product, User, Review,Interest
-from sqlalchemy import desc, asc, or_
-from sqlalchemy.orm import aliased
-from sqlalchemy.sql import func
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from app.models import db, Product, User, Interest, ProductImage
+from app.pagination import keyset_page, page_size, encode_cursor, decode_cursor, InvalidCursor
+from app.search import search_index
+from app.queries import shaped
+from app.facets import get_facets, invalidate_facets
+from app.images import images
+from app.storage import storage, media_url
+from app.uploads import ALLOWED_EXTENSIONS, save_image_upload
+from app.response_cache import response_cache, invalidate_product
+from app.trending import trending
 products = Blueprint('products', __name__)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+@products.errorhandler(RequestEntityTooLarge)
+@products.errorhandler(UnsupportedMediaType)
+def upload_rejected(error):
+    """Uploads refused while streaming in (see app.uploads) get a JSON error, not Werkzeug's HTML page."""
+    return jsonify({"error": error.description}), error.code
+
+
+# sort option -> (sort column, descending); Product.id breaks ties so every ordering is stable
+SORT_KEYS = {
+    "": (Product.id, False),
+    "price_asc": (Product.price, False),
+    "price_desc": (Product.price, True),
+    "newest": (Product.created_at, True),
+    "oldest": (Product.created_at, False),
+    "interested_desc": (Product.interested_count, True),
+    "rating_desc": (Product.rating_bayes, True),
+}
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def paginate_products(query, sort_option=""):
+    """Apply keyset pagination from the `cursor` and `limit` query args."""
+    column, descending = SORT_KEYS.get(sort_option, SORT_KEYS[""])
+    return keyset_page(
+        query, column, Product.id, descending,
+        cursor=request.args.get("cursor"),
+        limit=page_size(request.args.get("limit", type=int)),
+        tag=sort_option if sort_option in SORT_KEYS else "",
+    )
+
+def ranked_search_page(products_query, text):
+    """Page through search_index results in rank order, keeping only rows matching products_query.
+
+    The cursor records the position reached in the ranked id list; candidates are
+    checked against the database in id batches so each page costs a few PK lookups.
+    """
+    limit = page_size(request.args.get("limit", type=int))
+    offset = 0
+    cursor = request.args.get("cursor")
+    if cursor:
+        state = decode_cursor(cursor)
+        if not isinstance(state, dict) or state.get("s") != "search" or not isinstance(state.get("o"), int):
+            raise InvalidCursor("Cursor does not match this ordering")
+        offset = state["o"]
+
+    ranked_ids = [product_id for product_id, _ in search_index.search(text)]
+
+    page = []
+    while offset < len(ranked_ids) and len(page) < limit:
+        batch = ranked_ids[offset:offset + limit * 2]
+        found = {p.id: p for p in products_query.filter(Product.id.in_(batch)).all()}
+        for product_id in batch:
+            offset += 1
+            if product_id in found:
+                page.append(found[product_id])
+                if len(page) == limit:
+                    break
+
+    next_cursor = encode_cursor({"s": "search", "o": offset}) if offset < len(ranked_ids) else None
+    return page, next_cursor
+
+def paged_json(payload, next_cursor):
+    """JSON list response with the next page's cursor in the X-Next-Cursor header."""
+    response = jsonify(payload)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
 @products.route('/listings')
 def listings():
     """Fetch and filter product listings."""
@@ -36,11 +106,14 @@ def listings():
     if color:
         query = query.filter(Product.color.ilike(f'%{color}%'))  # Case-insensitive search
 
-    products = query.all()
+    try:
+        products, next_cursor = paginate_products(query, request.args.get('sort', ''))
+    except InvalidCursor:
+        return "Invalid cursor", 400
 
-    categories = [c[0] for c in db.session.query(Product.category).distinct().all()]
+    categories = [c["value"] for c in get_facets()["categories"]]
     
-    return render_template('listings.html', products=products, categories=categories)
+    return render_template('listings.html', products=products, categories=categories, next_cursor=next_cursor)
 
 @products.route('/add_listing', methods=['GET', 'POST'])
 @login_required
@@ -61,11 +134,11 @@ def add_listing():
         image = request.files.get('image')  
         image_filename = None  
 
+        image_path = None
         if image and allowed_file(image.filename):
-            filename = secure_filename(image.filename)
-            image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            image.save(image_path)
-            image_filename = filename  
+            # Already validated, hashed and spooled while the request streamed in (see app.uploads)
+            image_filename = save_image_upload(image)
+            image_path = storage.path(image_filename) if image_filename else None
 
         new_product = Product(
             name=name,
@@ -81,6 +154,13 @@ def add_listing():
 
         db.session.add(new_product)
         db.session.commit()
+        search_index.add(new_product)
+        invalidate_facets()
+        invalidate_product(new_product.id)
+
+        # Resized variants are produced off the request thread
+        if image_path:
+            images.submit(new_product.id, image_path)
 
         flash("Product listed successfully!", "success")
 
@@ -88,28 +168,74 @@ def add_listing():
 
     return render_template('add_listing.html')
 
+@products.route('/product/<int:product_id>/images', methods=['POST'])
+@login_required
+def upload_product_images(product_id):
+    """Attach several images to a listing in one request, each streamed and checked like add_listing's."""
+    product = Product.query.get_or_404(product_id)
+    if product.user_id != current_user.id:
+        return jsonify({"error": "You can only add images to your own listings"}), 403
+
+    files = [f for f in request.files.getlist('images') if f.filename]
+    if not files:
+        return jsonify({"error": "No images uploaded"}), 400
+
+    limit = current_app.config.get('MAX_IMAGES_PER_LISTING', 8)
+    existing = ProductImage.query.filter_by(product_id=product.id).count()
+    if existing + len(files) > limit:
+        return jsonify({"error": f"A listing can have at most {limit} images"}), 400
+
+    added = []
+    for position, upload in enumerate(files, start=existing):
+        key = save_image_upload(upload)
+        if key:
+            added.append(ProductImage(product_id=product.id, image=key, position=position))
+    db.session.add_all(added)
+
+    # A listing without a cover image takes the first upload as its cover
+    if added and (not product.image or product.image == 'nb.png'):
+        product.image = added[0].image
+    db.session.commit()
+    invalidate_product(product.id)
+
+    if added and product.image == added[0].image:
+        images.submit(product.id, storage.path(product.image))
+
+    return jsonify({"images": [
+        {"id": img.id, "image": img.image, "url": media_url(img.image)} for img in added
+    ]}), 201
+
 @products.route('/categories')
 def get_categories():
-    categories = [c[0] for c in db.session.query(Product.category).distinct().all()]
-    return jsonify({"categories": categories})
+    """Category names plus category, color and condition facets, served from the facet cache."""
+    facets = get_facets()
+    response = jsonify({
+        "categories": [c["value"] for c in facets["categories"]],
+        "facets": {name: facets[name] for name in ("categories", "colors", "conditions")}
+    })
+    response.set_etag(facets["etag"])
+    response.headers["Cache-Control"] = f"public, max-age={current_app.config.get('FACET_HTTP_MAX_AGE', 60)}"
+    return response.make_conditional(request)
 
 @products.route('/search', methods=['GET'])
 def search_products():
     query = request.args.get('query', '').strip()
     category = request.args.get('category', '')
 
-    products_query = Product.query.filter(Product.quantity_available > 0)
-
-    if query:
-        search_conditions = [Product.name.ilike(f'%{word}%') for word in query.split()]
-        products_query = products_query.filter(or_(*search_conditions))
+    products_query = shaped(Product.query).filter(Product.quantity_available > 0)  # Seller joined in, no per-row lazy load
 
     if category:
         products_query = products_query.filter(Product.category == category)
 
-    products = products_query.all()
+    try:
+        if query:
+            products, next_cursor = ranked_search_page(products_query, query)
+        else:
+            products, next_cursor = paginate_products(products_query)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify([{
+    return paged_json([{
         'id': p.id,
         'name': p.name,
         'price': p.price,
@@ -117,10 +243,29 @@ def search_products():
         'color': p.color,
         'quantity_available': p.quantity_available,
         'image_filename': p.image,
+        'image_variants': {name: v["file"] for name, v in p.variants.items()},
+        'image_url': media_url(p.image_for(480)),
         'listed_by': p.user.username if p.user else "Unknown Seller"
-    } for p in products])
+    } for p in products], next_cursor)
+
+@products.route("/trending", methods=["GET"])
+def trending_products():
+    """Top products by time-decayed activity, straight from the in-memory ranking."""
+    limit = page_size(request.args.get("limit", type=int), current_app.config.get("TRENDING_DEFAULT_LIMIT", 12))
+
+    # Over-fetch a little so sold-out products can be skipped without a second round trip
+    ranked = trending.top(limit * 2)
+    found = {p.id: p for p in Product.query.filter(
+        Product.id.in_([product_id for product_id, _ in ranked]), Product.quantity_available > 0
+    ).all()} if ranked else {}
+
+    return jsonify([
+        dict(found[product_id].serialize(), trending_score=round(score, 3))
+        for product_id, score in ranked if product_id in found
+    ][:limit])
 
 @products.route('/product/<int:product_id>')  # ✅ Added missing route decorator
+@response_cache.cached(tags=lambda product_id: [f"product:{product_id}"])
 def product_detail(product_id):
     product = Product.query.get(product_id)  
     if not product:
@@ -128,7 +273,7 @@ def product_detail(product_id):
     return render_template("product.html", product=product)
 
 @products.route("/all", methods=["GET"])
-@products.route("/all", methods=["GET"])
+@response_cache.cached(tags=lambda: ["products"], anonymous_only=False)  # Same JSON for everyone
 def get_all_products():
     sort_option = request.args.get("sort", "")
     category = request.args.get("category", "")
@@ -138,51 +283,11 @@ def get_all_products():
     if category:
         query = query.filter(Product.category == category)
 
-    if sort_option == "interested_desc":  # ✅ Fixed indentation
-        interest_alias = aliased(Interest)  # Create alias for Interest table
-        query = query.outerjoin(interest_alias).group_by(Product.id).order_by(desc(func.count(interest_alias.id)))
-    
-    elif sort_option == "price_asc":
-        query = query.order_by(asc(Product.price))
-    
-    elif sort_option == "price_desc":
-        query = query.order_by(desc(Product.price))
-
-    products = query.all()
-
-    return jsonify([product.serialize() for product in products])
-
-
-@products.route("/product/<int:product_id>/reviews", methods=["GET"])
-def get_reviews(product_id):
-    product = Product.query.get_or_404(product_id)
-    reviews = Review.query.filter_by(product_id=product_id).all()
-
-    return render_template("review.html", reviews=reviews, product=product)
-
-@products.route("/product/<int:product_id>/review", methods=["POST"])
-@login_required
-def add_review(product_id):
-    product = Product.query.get_or_404(product_id)
-
-    # 🚨 Prevent users from reviewing their own listings
-    if product.user_id == current_user.id:
-        return jsonify({"error": "Error: Cannot review this product"}), 403  
-
-    data = request.get_json()
-
-    if not data.get("comment") or not data.get("rating"):
-        return jsonify({"error": "Error: Rating and comment are required"}), 400
-
-    new_review = Review(
-        rating=int(data["rating"]),
-        comment=data["comment"],
-        product_id=product.id,
-        user_id=current_user.id
-    )
-
-    db.session.add(new_review)
-    db.session.commit()
+    # Each page is a bounded range scan on the sort key's index, however deep the client scrolls
+    try:
+        products, next_cursor = paginate_products(query, sort_option)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({"message": "✅ Review added successfully!"}), 201
+    return paged_json([product.serialize() for product in products], next_cursor)
 
@@ -0,0 +1,146 @@
+import json
+import queue
+import threading
+
+
+class Subscription:
+    """A subscriber's view of one channel; get() blocks until a payload arrives or the timeout passes."""
+
+    def get(self, timeout=None):
+        """Return the next payload, or None on timeout."""
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class Broker:
+    """Interface for pub/sub brokers that fan messages out to subscribers."""
+
+    def publish(self, channel, payload):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Return a Subscription receiving payloads published to `channel` from now on."""
+        raise NotImplementedError
+
+
+class _LocalSubscription(Subscription):
+    def __init__(self, broker, channel, maxsize):
+        self._broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            # A stalled client loses its oldest payload rather than growing without bound
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(payload)
+
+    def close(self):
+        self._broker._unsubscribe(self)
+
+
+class InMemoryBroker(Broker):
+    """In-process broker; every subscriber gets a bounded queue. Suits a single worker and tests."""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def publish(self, channel, payload):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(payload)
+
+    def subscribe(self, channel):
+        subscription = _LocalSubscription(self, channel, self.max_pending)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+
+class _RedisSubscription(Subscription):
+    def __init__(self, client, channel):
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(channel)
+
+    def get(self, timeout=None):
+        message = self._pubsub.get_message(timeout=timeout or 0)
+        if message is None:
+            return None
+        return json.loads(message["data"])
+
+    def close(self):
+        self._pubsub.close()
+
+
+class RedisBroker(Broker):
+    """Broker backed by Redis PUBLISH/SUBSCRIBE so every worker sees every message."""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RedisBroker requires the `redis` package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, payload):
+        self._client.publish(channel, json.dumps(payload))
+
+    def subscribe(self, channel):
+        return _RedisSubscription(self._client, channel)
+
+
+class Hub:
+    """Application-wide pub/sub hub; the broker is chosen from PUBSUB_BROKER_URL."""
+
+    def __init__(self):
+        self.broker = InMemoryBroker()
+
+    def init_app(self, app):
+        url = app.config.get("PUBSUB_BROKER_URL")
+        if url and url.startswith("redis"):
+            self.broker = RedisBroker(url)
+        else:
+            self.broker = InMemoryBroker(app.config.get("PUBSUB_MAX_PENDING", 100))
+        app.extensions["hub"] = self
+
+    def publish(self, channel, payload):
+        self.broker.publish(channel, payload)
+
+    def subscribe(self, channel):
+        return self.broker.subscribe(channel)
+
+
+def user_channel(user_id):
+    """Channel carrying every chat message sent to or by a user."""
+    return f"user:{user_id}"
+
+
+hub = Hub()
@@ -0,0 +1,27 @@
+from flask import request
+from sqlalchemy.orm import joinedload
+from app.models import Product, Cart, Interest, Review
+
+
+# Loader options per endpoint. Each entry is a callable because backref
+# attributes such as Product.user only exist once the mappers are configured.
+ENDPOINT_LOADERS = {
+    "products.search_products": lambda: (joinedload(Product.user),),
+    "cart.get_cart": lambda: (joinedload(Cart.product),),
+    "cart.batch_update": lambda: (joinedload(Cart.product),),
+    "interest.get_interested_products": lambda: (joinedload(Interest.product),),
+    "review.get_reviews": lambda: (joinedload(Review.user),),
+}
+
+
+def check_endpoint_loaders(app):
+    """Fail at startup if ENDPOINT_LOADERS names an endpoint the app doesn't have."""
+    unknown = sorted(set(ENDPOINT_LOADERS) - set(app.view_functions))
+    if unknown:
+        raise RuntimeError(f"ENDPOINT_LOADERS names unknown endpoint(s): {', '.join(unknown)}")
+
+
+def shaped(query, endpoint=None):
+    """Apply the eager-loading options registered for the current (or given) endpoint."""
+    loaders = ENDPOINT_LOADERS.get(endpoint or request.endpoint)
+    return query.options(*loaders()) if loaders else query
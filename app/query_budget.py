@@ -0,0 +1,42 @@
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in testing when a request issues more SQL statements than allowed."""
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_statements = g.get("sql_statements", 0) + 1
+
+
+def statements_this_request():
+    """Number of SQL statements executed so far while handling the current request."""
+    return g.get("sql_statements", 0)
+
+
+def init_query_budget(app):
+    """Count SQL statements per request and, in testing, fail requests over SQLALCHEMY_MAX_QUERIES_PER_REQUEST."""
+    if not event.contains(Engine, "before_cursor_execute", _count_statement):
+        event.listen(Engine, "before_cursor_execute", _count_statement)
+
+    @app.before_request
+    def reset_statement_count():
+        # Tests often keep one app context (and so one `g`) across requests
+        g.sql_statements = 0
+
+    @app.after_request
+    def enforce_query_budget(response):
+        count = statements_this_request()
+        if app.debug or app.testing or app.config.get("SQL_STATEMENTS_HEADER"):
+            response.headers["X-SQL-Statements"] = str(count)
+
+        limit = app.config.get("SQLALCHEMY_MAX_QUERIES_PER_REQUEST")
+        if app.testing and limit is not None and count > limit:
+            raise QueryBudgetExceeded(
+                f"{count} SQL statements issued by {request.method} {request.path} (budget {limit})"
+            )
+        return response
+
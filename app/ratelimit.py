@@ -0,0 +1,162 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class RateLimitBackend:
+    """Interface for the per-key window counters behind RateLimiter."""
+
+    def incr(self, key, window_index, ttl):
+        """Count one hit in window_index and return (current window count, previous window count)."""
+        raise NotImplementedError
+
+    def counts(self, key, window_index):
+        """(current, previous) window counts without counting a hit."""
+        raise NotImplementedError
+
+    def reset(self, key, window_index):
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process counters: three ints per key, least recently used keys dropped past max_keys."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()  # key -> [window index, current count, previous count]
+
+    def _roll(self, key, window_index):
+        entry = self._windows.get(key)
+        if entry is None:
+            entry = self._windows[key] = [window_index, 0, 0]
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+        elif entry[0] != window_index:
+            previous = entry[1] if entry[0] == window_index - 1 else 0
+            entry[:] = [window_index, 0, previous]
+        self._windows.move_to_end(key)
+        return entry
+
+    def incr(self, key, window_index, ttl):
+        with self._lock:
+            entry = self._roll(key, window_index)
+            entry[1] += 1
+            return entry[1], entry[2]
+
+    def counts(self, key, window_index):
+        with self._lock:
+            entry = self._roll(key, window_index)
+            return entry[1], entry[2]
+
+    def reset(self, key, window_index):
+        with self._lock:
+            self._windows.pop(key, None)
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Counters shared by every worker, one short-lived Redis key per key and window."""
+
+    def __init__(self, url, prefix="rl:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RedisRateLimitBackend requires the `redis` package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _name(self, key, window_index):
+        return f"{self.prefix}{key}:{window_index}"
+
+    def incr(self, key, window_index, ttl):
+        with self._client.pipeline() as pipe:
+            pipe.incr(self._name(key, window_index))
+            pipe.expire(self._name(key, window_index), ttl)
+            pipe.get(self._name(key, window_index - 1))
+            current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def counts(self, key, window_index):
+        current, previous = self._client.mget(self._name(key, window_index), self._name(key, window_index - 1))
+        return int(current or 0), int(previous or 0)
+
+    def reset(self, key, window_index):
+        self._client.delete(self._name(key, window_index), self._name(key, window_index - 1))
+
+
+class RateLimiter:
+    """Sliding-window limits, approximated from fixed windows.
+
+    A key's rate is its count in the current window plus the previous window's
+    count, weighted by how much of that window still overlaps the sliding one.
+    This needs only two counters per key, however many hits it takes.
+    The backend is chosen by RATELIMIT_BACKEND ("memory" or "redis").
+    """
+
+    def __init__(self):
+        self.backend = MemoryRateLimitBackend()
+        self.enabled = True
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATELIMIT_ENABLED", True)
+        if app.config.get("RATELIMIT_BACKEND", "memory") == "redis":
+            self.backend = RedisRateLimitBackend(app.config.get("RATELIMIT_URL") or app.config["CACHE_URL"])
+        else:
+            self.backend = MemoryRateLimitBackend(app.config.get("RATELIMIT_MAX_KEYS", 100000))
+        app.extensions["ratelimit"] = self
+
+    def hit(self, key, limit, window):
+        """Count a hit; return seconds to wait if the key is now over limit, else None."""
+        return self._check(key, limit, window, count=True)
+
+    def peek(self, key, limit, window):
+        """Like hit() but without counting; for limits that only failures feed."""
+        return self._check(key, limit, window, count=False)
+
+    def reset(self, key, window):
+        self.backend.reset(f"{key}/{window}", int(time.time() // window))
+
+    def _check(self, key, limit, window, count):
+        if not self.enabled:
+            return None
+        now = time.time()
+        index = int(now // window)
+        name = f"{key}/{window}"
+        if count:
+            current, previous = self.backend.incr(name, index, window * 2)
+        else:
+            current, previous = self.backend.counts(name, index)
+
+        elapsed = now - index * window
+        rate = current + previous * (window - elapsed) / window
+        # A hit that is counted may take the rate to exactly the limit; a peek asks whether one more is allowed
+        if (rate > limit) if count else (rate >= limit):
+            return max(1, math.ceil(window - elapsed))
+        return None
+
+
+limiter = RateLimiter()
+
+
+def login_blocked(ip, email):
+    """Seconds a login attempt must wait, checked before any password hashing; None if it may proceed.
+
+    Every attempt counts against the client's IP. Only failures count against
+    the email, and a successful login clears them.
+    """
+    config = current_app.config
+    return (
+        limiter.peek(f"login-fail:{email}", config.get("LOGIN_EMAIL_FAILURE_LIMIT", 5), config.get("LOGIN_EMAIL_WINDOW", 900))
+        or limiter.hit(f"login-ip:{ip}", config.get("LOGIN_IP_LIMIT", 30), config.get("LOGIN_IP_WINDOW", 300))
+    )
+
+
+def login_failed(email):
+    limiter.hit(f"login-fail:{email}", current_app.config.get("LOGIN_EMAIL_FAILURE_LIMIT", 5),
+                current_app.config.get("LOGIN_EMAIL_WINDOW", 900))
+
+
+def login_succeeded(email):
+    limiter.reset(f"login-fail:{email}", current_app.config.get("LOGIN_EMAIL_WINDOW", 900))
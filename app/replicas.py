@@ -0,0 +1,97 @@
+import random
+import sqlite3
+import time
+from flask import g, has_app_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_KEY = "_db_primary_until"
+
+
+class RoutingSession(Session):
+    """Session that sends reads in safe requests to a replica and everything else to the primary.
+
+    The replica is chosen per request by init_replicas(). Once this session has
+    written anything, by flushing or by a bulk INSERT, UPDATE or DELETE, it
+    stays on the primary for the rest of its life, so a request always reads
+    its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self._flushing or self.info.get("wrote") or isinstance(clause, UpdateBase):
+            return primary
+        replica_key = g.get("db_replica") if has_app_context() else None
+        if replica_key is None or primary is not self._db.engines.get(None):
+            return primary  # Outside a routed request, or a model on its own bind
+        return self._db.engines[replica_key]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _remember_bulk_write(orm_execute_state):
+    # Query.update()/.delete() and session.execute(insert(...)) never flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    if session.info.get("wrote") and has_app_context():
+        g.db_committed_write = True
+
+
+def replica_keys(app):
+    return [f"replica_{i}" for i in range(len(app.config.get("SQLALCHEMY_REPLICA_URIS") or []))]
+
+
+def init_replicas(app):
+    """Register SQLALCHEMY_REPLICA_URIS as binds and route safe requests to them; call before db.init_app(app).
+
+    After a request commits a write, the client reads from the primary for
+    REPLICA_STICKY_SECONDS (tracked in the session cookie), so a seller sees a
+    new listing and a chat sees its sent message even while replicas lag.
+    """
+    keys = replica_keys(app)
+    if not keys:
+        return
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    binds.update(zip(keys, app.config["SQLALCHEMY_REPLICA_URIS"]))
+    app.config["SQLALCHEMY_BINDS"] = binds
+    sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", 10)
+
+    @app.before_request
+    def choose_database_route():
+        g.db_replica = None
+        if request.method in SAFE_METHODS and session.get(STICKY_KEY, 0) <= time.time():
+            g.db_replica = random.choice(keys)
+
+    @app.after_request
+    def remember_recent_write(response):
+        if g.pop("db_committed_write", False):
+            session[STICKY_KEY] = time.time() + sticky_seconds
+        return response
+
+
+def sync_sqlite_replicas(app):
+    """Copy the primary SQLite database over each SQLite replica (development and tests only)."""
+    primary = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if primary.get_backend_name() != "sqlite":
+        raise RuntimeError("Replica sync only supports SQLite; real replicas are fed by the database server")
+
+    copied = []
+    with sqlite3.connect(primary.database) as source:
+        for uri in app.config.get("SQLALCHEMY_REPLICA_URIS") or []:
+            target_url = make_url(uri)
+            with sqlite3.connect(target_url.database) as target:
+                source.backup(target)
+            copied.append(target_url.database)
+    return copied
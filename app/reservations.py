@@ -0,0 +1,292 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, case, false, insert, or_
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app.database import db
+from app.idempotency import claim_idempotency_key, prune_idempotency_keys, raise_if_key_taken
+from app.models import Cart, Product
+
+
+# What reserve() did: the cart line's new held quantity and expiry, and the product's stock before and after
+Hold = namedtuple("Hold", "cart_id quantity reserved_until stock_before stock_after")
+
+
+class OutOfStock(Exception):
+    """Raised when a product doesn't have enough unheld stock left."""
+
+
+class CartRejected(Exception):
+    """Raised by apply_cart_operations() with {product_id: reason} when a batch can't be applied in full."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class ReservationConflict(RuntimeError):
+    """Raised when a cart change kept losing races to concurrent ones and ran out of retries."""
+
+
+class LostRace(Exception):
+    """A conditional UPDATE matched nothing because another transaction got there first; retry."""
+
+
+def atomic(work):
+    """Run work() in one transaction and commit it, starting over when it loses a race.
+
+    A unique constraint firing, a conditional UPDATE coming back empty
+    (LostRace) or the database reporting a lock conflict all roll the whole
+    attempt back and retry with a short random backoff, up to
+    RESERVATION_RETRIES times. The request's idempotency key, if any, is
+    claimed in the same transaction. Returns whatever work() returned.
+    """
+    retries = current_app.config.get("RESERVATION_RETRIES", 8)
+    for attempt in range(retries):
+        try:
+            claim_idempotency_key()
+            result = work()
+            db.session.commit()
+            return result
+        except LostRace:
+            db.session.rollback()
+        except IntegrityError:
+            db.session.rollback()
+            raise_if_key_taken()
+        except OperationalError as error:
+            db.session.rollback()
+            if not _is_lock_conflict(error):
+                raise
+        except Exception:
+            db.session.rollback()
+            raise
+        time.sleep(random.uniform(0, 0.002 * 2 ** attempt))
+    raise ReservationConflict(f"Gave up after {retries} attempts")
+
+
+def hold_expiry(now=None):
+    return (now or datetime.utcnow()) + timedelta(seconds=current_app.config.get("CART_HOLD_SECONDS", 900))
+
+
+def reserve(user_id, product_id, quantity):
+    """Hold `quantity` more of a product in the user's cart, taking it out of stock; run inside atomic().
+
+    Stock only ever moves through a conditional UPDATE, so concurrent holds
+    can't take more than there is, and the unique (user, product) constraint
+    keeps one cart line per pair. A line whose hold lapsed has to be held again
+    in full. Raises OutOfStock.
+    """
+    released = release_expired(product_ids=[product_id]).get(product_id, 0)
+    line = db.session.query(Cart.id, Cart.quantity, Cart.reserved_until).filter_by(
+        user_id=user_id, product_id=product_id
+    ).first()
+    held = line is not None and line.reserved_until is not None
+    needed = quantity if line is None or held else line.quantity + quantity
+
+    if not _take_stock(product_id, needed):
+        raise OutOfStock(product_id)
+    stock_after = db.session.query(Product.quantity_available).filter_by(id=product_id).scalar()
+
+    until = hold_expiry()
+    if line is None:
+        item = Cart(user_id=user_id, product_id=product_id, quantity=quantity, reserved_until=until)
+        db.session.add(item)
+        db.session.flush()  # A concurrent insert of the same line fails here, on uq_cart_user_product
+        cart_id, new_quantity = item.id, quantity
+    else:
+        # Compare-and-set against what was read, so a concurrent change to the line forces a retry
+        updated = Cart.query.filter(
+            Cart.id == line.id, Cart.quantity == line.quantity,
+            Cart.reserved_until.isnot(None) if held else Cart.reserved_until.is_(None),
+        ).update({Cart.quantity: line.quantity + quantity, Cart.reserved_until: until}, synchronize_session=False)
+        if updated != 1:
+            raise LostRace()
+        cart_id, new_quantity = line.id, line.quantity + quantity
+
+    return Hold(cart_id, new_quantity, until, stock_after + needed - released, stock_after)
+
+
+def apply_cart_operations(user_id, operations):
+    """Apply ("add" | "set" | "remove", product_id, quantity) operations to a cart, all or nothing; run inside atomic().
+
+    Products are validated in one query and every stock move is one UPDATE
+    whose CASE takes each product's difference only where that much is left,
+    so a listing running short (or a concurrent change) fails the batch
+    rather than part of it. Every line left in the cart ends up held with a
+    fresh expiry. Raises CartRejected.
+    Returns {product_id: (stock before, stock after)} for products whose stock moved.
+    """
+    product_ids = {product_id for _, product_id, _ in operations}
+    released = release_expired(product_ids=product_ids)
+    products = {row.id: row for row in db.session.query(
+        Product.id, Product.user_id, Product.quantity_available
+    ).filter(Product.id.in_(product_ids))}
+    lines = {row.product_id: row for row in db.session.query(
+        Cart.id, Cart.product_id, Cart.quantity, Cart.reserved_until
+    ).filter(Cart.user_id == user_id, Cart.product_id.in_(product_ids))}
+
+    quantities = {product_id: line.quantity for product_id, line in lines.items()}
+    for op, product_id, quantity in operations:
+        current = quantities.get(product_id, 0)
+        quantities[product_id] = current + quantity if op == "add" else quantity if op == "set" else 0
+
+    errors, deltas = {}, {}
+    for product_id in product_ids:
+        product, line, quantity = products.get(product_id), lines.get(product_id), quantities.get(product_id, 0)
+        held = line.quantity if line is not None and line.reserved_until is not None else 0
+        if product is None:
+            errors[product_id] = "Product not found"
+        elif quantity and product.user_id == user_id:
+            errors[product_id] = "You cannot add your own product to the cart"
+        elif quantity - held > product.quantity_available:
+            errors[product_id] = "Not enough stock available"
+        elif quantity != held:
+            deltas[product_id] = quantity - held
+    if errors:
+        raise CartRejected(errors)
+
+    if deltas:
+        delta = case(deltas, value=Product.id)
+        moved = Product.query.filter(Product.id.in_(deltas), Product.quantity_available >= delta).update(
+            {Product.quantity_available: Product.quantity_available - delta}, synchronize_session=False
+        )
+        if moved != len(deltas):
+            raise LostRace()  # Stock moved since it was read; validate again
+
+    until = hold_expiry()
+    kept = [line for product_id, line in lines.items() if quantities[product_id]]
+    dropped = [line for product_id, line in lines.items() if not quantities[product_id]]
+    if kept:
+        updated = Cart.query.filter(_unchanged(kept)).update({
+            Cart.quantity: case({line.id: quantities[line.product_id] for line in kept}, value=Cart.id),
+            Cart.reserved_until: until,
+        }, synchronize_session=False)
+        if updated != len(kept):
+            raise LostRace()
+    if dropped:
+        if Cart.query.filter(_unchanged(dropped)).delete(synchronize_session=False) != len(dropped):
+            raise LostRace()
+    new_lines = [
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity, "reserved_until": until}
+        for product_id, quantity in quantities.items() if quantity and product_id not in lines
+    ]
+    if new_lines:
+        # One executemany; a line inserted concurrently fails it on uq_cart_user_product
+        db.session.execute(insert(Cart), new_lines)
+
+    return {
+        product_id: (products[product_id].quantity_available - released.get(product_id, 0),
+                     products[product_id].quantity_available - deltas.get(product_id, 0))
+        for product_id in set(deltas) | set(released)
+    }
+
+
+def release_line(user_id, cart_id):
+    """Give back a cart line's held stock and delete the line; run inside atomic().
+
+    Returns (product_id, quantity released) or None when the user has no such line.
+    """
+    line = db.session.query(Cart.product_id, Cart.quantity, Cart.reserved_until).filter_by(
+        id=cart_id, user_id=user_id
+    ).first()
+    if line is None:
+        return None
+
+    deleted = Cart.query.filter(
+        Cart.id == cart_id, Cart.quantity == line.quantity,
+        Cart.reserved_until == line.reserved_until if line.reserved_until else Cart.reserved_until.is_(None),
+    ).delete(synchronize_session=False)
+    if deleted != 1:
+        raise LostRace()
+    if line.reserved_until is None:
+        return line.product_id, 0
+    _return_stock(line.product_id, line.quantity)
+    return line.product_id, line.quantity
+
+
+def release_expired(product_ids=None, user_id=None, now=None):
+    """Return the stock of holds that lapsed before `now` to their products; the caller commits.
+
+    The lines stay in their carts, unheld. Each hold is cleared with a
+    conditional UPDATE, so when two sweeps race only one returns its stock.
+    Returns {product_id: quantity released}.
+    """
+    query = db.session.query(Cart.id, Cart.product_id, Cart.quantity, Cart.reserved_until).filter(
+        Cart.reserved_until < (now or datetime.utcnow())
+    )
+    if product_ids is not None:
+        query = query.filter(Cart.product_id.in_(product_ids))
+    if user_id is not None:
+        query = query.filter(Cart.user_id == user_id)
+
+    released = {}
+    for cart_id, line_product_id, quantity, reserved_until in query.all():
+        cleared = Cart.query.filter(
+            Cart.id == cart_id, Cart.quantity == quantity, Cart.reserved_until == reserved_until
+        ).update({Cart.reserved_until: None}, synchronize_session=False)
+        if cleared == 1:
+            _return_stock(line_product_id, quantity)
+            released[line_product_id] = released.get(line_product_id, 0) + quantity
+    return released
+
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def sweep_due():
+    """True at most once per RESERVATION_SWEEP_SECONDS in this process; cart writes then sweep every lapsed hold."""
+    global _last_sweep
+    interval = current_app.config.get("RESERVATION_SWEEP_SECONDS", 60)
+    now = time.monotonic()
+    with _sweep_lock:
+        if now - _last_sweep < interval:
+            return False
+        _last_sweep = now
+        return True
+
+
+def sweep_expired_holds():
+    """Release every lapsed hold and prune old idempotency keys in one transaction (`flask release-expired-holds`)."""
+    released = release_expired()
+    pruned = prune_idempotency_keys()
+    db.session.commit()
+    return released, pruned
+
+
+def _unchanged(lines):
+    """Match cart lines still holding (or not holding) the quantity they had when read."""
+    held = [line for line in lines if line.reserved_until is not None]
+    unheld = [line for line in lines if line.reserved_until is None]
+    return and_(
+        Cart.id.in_([line.id for line in lines]),
+        Cart.quantity == case({line.id: line.quantity for line in lines}, value=Cart.id),
+        or_(
+            and_(Cart.id.in_([line.id for line in held]), Cart.reserved_until.isnot(None)) if held else false(),
+            and_(Cart.id.in_([line.id for line in unheld]), Cart.reserved_until.is_(None)) if unheld else false(),
+        ),
+    )
+
+
+def _take_stock(product_id, quantity):
+    """Take quantity out of a product's stock only if it has that much; False when it doesn't."""
+    return Product.query.filter(
+        Product.id == product_id, Product.quantity_available >= quantity
+    ).update(
+        {Product.quantity_available: Product.quantity_available - quantity}, synchronize_session=False
+    ) == 1
+
+
+def _return_stock(product_id, quantity):
+    Product.query.filter_by(id=product_id).update(
+        {Product.quantity_available: Product.quantity_available + quantity}, synchronize_session=False
+    )
+
+
+def _is_lock_conflict(error):
+    # SQLite "database is locked", MySQL deadlocks and lock wait timeouts, PostgreSQL serialization failures
+    message = str(error.orig).lower()
+    return any(text in message for text in ("locked", "deadlock", "lock wait timeout", "could not serialize"))
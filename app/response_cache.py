@@ -0,0 +1,244 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+from flask import copy_current_request_context, current_app, request, session
+from flask_login import current_user
+from app.cache import MemoryCache
+from app.extensions import cache
+
+
+logger = logging.getLogger(__name__)
+
+# Response headers worth replaying from a cached entry
+STORED_HEADERS = ("Content-Type", "X-Next-Cursor", "Cache-Control", "Vary")
+
+
+class CachedResponse:
+    """A stored response body plus the times it stops being fresh and stops being servable."""
+
+    def __init__(self, status, headers, body, fresh_until, stale_until):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class ResponseStore:
+    """Interface for where cached responses live (see MemoryResponseStore, FileResponseStore)."""
+
+    def get(self, key):
+        """Return the CachedResponse for key, or None."""
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryResponseStore(ResponseStore):
+    """Per-process LRU of responses; entries expire once past their stale window."""
+
+    def __init__(self, max_entries=2000):
+        self._lru = MemoryCache(max_entries=max_entries, default_ttl=0)
+
+    def get(self, key):
+        entry = self._lru.get(key)
+        if entry is not None and entry.stale_until <= time.time():
+            self._lru.delete(key)
+            return None
+        return entry
+
+    def set(self, key, entry):
+        self._lru.set(key, entry, ttl=max(entry.stale_until - time.time(), 1))
+
+    def clear(self):
+        self._lru.clear()
+
+
+class FileResponseStore(ResponseStore):
+    """Responses pickled to one file per key, shared by every worker on the host and kept across restarts."""
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".resp")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if entry.stale_until <= time.time():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def set(self, key, entry):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))  # Atomic, so readers never load half an entry
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".resp"):
+                os.unlink(os.path.join(self.directory, name))
+
+
+class ResponseCache:
+    """Whole-response cache for read-mostly views, applied with the @cached() decorator.
+
+    Keys combine the endpoint, its view args, the sorted query string, a user
+    segment and the current generation of each tag the view declares. Writers
+    call invalidate(tag), which bumps that tag's generation in the application
+    cache so every key built from the old one is simply never read again. Use a
+    shared CACHE_BACKEND when several workers must see each other's invalidations.
+    """
+
+    def __init__(self):
+        self.store = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        kind = app.config.get("RESPONSE_CACHE_BACKEND", "memory")
+        if kind == "filesystem":
+            self.store = FileResponseStore(app.config.get("RESPONSE_CACHE_DIR", os.path.join("instance", "response_cache")))
+        else:
+            self.store = MemoryResponseStore(app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 2000))
+        app.extensions["response_cache"] = self
+
+    def cached(self, ttl=None, stale_ttl=None, tags=None, anonymous_only=True):
+        """Cache a view's GET responses.
+
+        tags is a callable taking the view args and returning tag names. With
+        anonymous_only set, logged-in users (whose pages differ) skip the
+        cache. After ttl an entry is still served for stale_ttl more seconds
+        while a background thread rebuilds it.
+        """
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self._cacheable(anonymous_only):
+                    return view(*args, **kwargs)
+
+                key = self._key(tags(**kwargs) if tags else [], kwargs)
+                entry = self.store.get(key)
+                now = time.time()
+                if entry is not None:
+                    if entry.fresh_until <= now:
+                        self._refresh_in_background(key, view, args, kwargs, ttl, stale_ttl)
+                        return self._replay(entry, "STALE")
+                    return self._replay(entry, "HIT")
+
+                response = current_app.make_response(view(*args, **kwargs))
+                self._store(key, response, ttl, stale_ttl)
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """Retire every cached response built under these tags."""
+        stamp = time.time_ns()
+        for tag in tags:
+            cache.set(self._generation_key(tag), stamp, ttl=0)
+
+    def clear(self):
+        self.store.clear()
+
+    def _cacheable(self, anonymous_only):
+        if not current_app.config.get("RESPONSE_CACHE_ENABLED", True) or request.method != "GET":
+            return False
+        if anonymous_only and current_user.is_authenticated:
+            return False
+        return "_flashes" not in session  # A pending flash message would be baked into the page
+
+    def _key(self, tags, view_args):
+        segment = "auth" if current_user.is_authenticated else "anon"
+        # Percent-encoded, so a value containing "&" or "=" can't pass for another request's key
+        query = urlencode(sorted(request.args.items(multi=True)))
+        generations = ",".join(f"{tag}:{self._generation(tag)}" for tag in tags)
+        args = urlencode(sorted((k, str(v)) for k, v in view_args.items()))
+        return f"resp:{request.endpoint}:{args}?{query}|{segment}|{generations}"
+
+    @staticmethod
+    def _generation_key(tag):
+        return f"resp-gen:{tag}"
+
+    def _generation(self, tag):
+        generation = cache.get(self._generation_key(tag))
+        if generation is None:
+            # Start (or, after an eviction, restart) from a fresh stamp so old entries can't come back
+            generation = time.time_ns()
+            cache.set(self._generation_key(tag), generation, ttl=0)
+        return generation
+
+    def _store(self, key, response, ttl, stale_ttl):
+        if response.status_code != 200 or response.is_streamed:
+            return
+        ttl = current_app.config.get("RESPONSE_CACHE_TTL", 60) if ttl is None else ttl
+        stale_ttl = current_app.config.get("RESPONSE_CACHE_STALE_TTL", 300) if stale_ttl is None else stale_ttl
+        now = time.time()
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        self.store.set(key, CachedResponse(response.status_code, headers, response.get_data(), now + ttl, now + ttl + stale_ttl))
+
+    def _replay(self, entry, state):
+        response = current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+        response.headers["X-Cache"] = state
+        return response
+
+    def _refresh_in_background(self, key, view, args, kwargs, ttl, stale_ttl):
+        with self._lock:
+            if key in self._refreshing:
+                return  # Someone is already rebuilding this entry
+            self._refreshing.add(key)
+
+        @copy_current_request_context
+        def refresh():
+            try:
+                self._store(key, current_app.make_response(view(*args, **kwargs)), ttl, stale_ttl)
+            except Exception:
+                logger.exception("Background refresh failed for %s", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="response-cache-refresh", daemon=True).start()
+
+
+response_cache = ResponseCache()
+
+
+def invalidate_product(product_id, listings=True):
+    """Call after a product's fields, images, stock or interest count change.
+
+    listings=False keeps the cached product lists, for changes that can't add,
+    remove or reorder them, such as stock moving while staying above zero.
+    """
+    if listings:
+        response_cache.invalidate("products", f"product:{product_id}")
+    else:
+        response_cache.invalidate(f"product:{product_id}")
+
+
+def invalidate_reviews(product_id):
+    """Call after a review on the product is added or removed."""
+    response_cache.invalidate("products", f"reviews:{product_id}", f"product:{product_id}")
@@ -2,12 +2,25 @@ from flask import request, jsonify,render_template,Blueprint
 from flask_login import login_required, current_user
 from app.database import  db
 from app.models import Product, Review
+from app.queries import shaped
+from app.counters import adjust_rating
+from app.pagination import keyset_page, page_size, InvalidCursor
+from app.response_cache import response_cache, invalidate_reviews
+from app.trending import trending
 review_bp = Blueprint("review", __name__)
 @review_bp.route("/products/product/<int:product_id>/reviews", methods=["GET"])
+@response_cache.cached(tags=lambda product_id: [f"reviews:{product_id}"])
 def get_reviews(product_id):
      product = Product.query.get_or_404(product_id)
-     reviews = Review.query.filter_by(product_id=product_id).all()
-     return render_template("review.html", reviews=reviews, product=product)
+     # Newest first, one page at a time; the rating summary comes from the product's stored aggregates
+     try:
+         reviews, next_cursor = keyset_page(
+             shaped(Review.query).filter_by(product_id=product_id), Review.id, Review.id, True,
+             cursor=request.args.get("cursor"), limit=page_size(request.args.get("limit", type=int), 20), tag="reviews",
+         )
+     except InvalidCursor:
+         return "Invalid cursor", 400
+     return render_template("review.html", reviews=reviews, product=product, next_cursor=next_cursor)
 
 @review_bp.route("/products/product/<int:product_id>/review", methods=["POST"])
 @login_required
@@ -27,9 +40,14 @@ def add_review(product_id):
     if not (1 <= rating <= 5) or not comment:
         return jsonify({"message": "Invalid rating or empty comment"}), 400
 
-    new_review = Review(user_id=current_user.id, product_id=product_id, rating=rating, comment=comment)
+    # Review row and product aggregates are committed together
+    user_id = current_user.id  # Read once: the commit below expires the user
+    new_review = Review(user_id=user_id, product_id=product_id, rating=rating, comment=comment)
     db.session.add(new_review)
+    adjust_rating(product_id, rating)
     db.session.commit()
+    invalidate_reviews(product_id)
+    trending.record(product_id, "review", actor_id=user_id)
 
     return jsonify({"message": "Review added successfully!"}), 201
 
@@ -46,6 +64,9 @@ def delete_review(product_id, review_id):
         return jsonify({"error": "You can only delete your own reviews"}), 403
     
     db.session.delete(review)
+    if 1 <= review.rating <= 5:
+        adjust_rating(review.product_id, review.rating, sign=-1)
     db.session.commit()
+    invalidate_reviews(review.product_id)
     
     return jsonify({"message": "Review deleted successfully"}), 200
@@ -0,0 +1,155 @@
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Field weights used when scoring a match; a hit in the name counts most
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "color": 1.5, "description": 1.0}
+
+# A prefix expansion ("lap" -> "laptop") scores less than an exact term match
+PREFIX_DISCOUNT = 0.5
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text):
+    """Lowercase and split text into alphanumeric terms."""
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class SearchBackend:
+    """Interface for product search engines used by /products/search."""
+
+    high_water = 0  # Highest product id indexed so far
+
+    def index(self, product):
+        """Add or replace a product in the index."""
+        raise NotImplementedError
+
+    def remove(self, product_id):
+        """Drop a product from the index."""
+        raise NotImplementedError
+
+    def search(self, text, limit=None):
+        """Return [(product_id, score)] best match first."""
+        raise NotImplementedError
+
+
+class InMemorySearchIndex(SearchBackend):
+    """Inverted index over product name, description, category and color.
+
+    Postings map each term to {product_id: weighted term frequency}; a sorted
+    term list lets the query's words match as prefixes for type-ahead.
+    Scores are tf-idf summed over the query terms.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._terms = []
+        self.high_water = 0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def index(self, product):
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(getattr(product, field, None)):
+                weights[term] += weight
+
+        with self._lock:
+            self._drop(product.id)
+            for term, weight in weights.items():
+                if term not in self._postings:
+                    insort(self._terms, term)
+                self._postings[term][product.id] = weight
+            self._doc_terms[product.id] = set(weights)
+            self.high_water = max(self.high_water, product.id)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._drop(product_id)
+
+    def search(self, text, limit=None):
+        terms = tokenize(text)
+        if not terms:
+            return []
+
+        scores = defaultdict(float)
+        with self._lock:
+            total = len(self._doc_terms) or 1
+            for query_term in dict.fromkeys(terms):
+                for term, discount in self._expand(query_term):
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    for product_id, weight in postings.items():
+                        scores[product_id] += discount * idf * weight
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+    def _expand(self, query_term):
+        """Yield (term, discount) for the exact term and its indexed prefix completions."""
+        if query_term in self._postings:
+            yield query_term, 1.0
+
+        start = bisect_left(self._terms, query_term)
+        expansions = 0
+        for term in self._terms[start:]:
+            if not term.startswith(query_term) or expansions >= MAX_PREFIX_EXPANSIONS:
+                break
+            if term != query_term:
+                expansions += 1
+                yield term, PREFIX_DISCOUNT
+
+    def _drop(self, product_id):
+        for term in self._doc_terms.pop(product_id, ()):
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+
+class ProductSearch:
+    """Keeps a SearchBackend in sync with the Product table.
+
+    The index is filled lazily on first use. Before each search it pulls any
+    products with an id above its high-water mark, so listings committed by
+    other workers show up with a single primary-key range scan.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or InMemorySearchIndex()
+        self._sync_lock = threading.Lock()
+
+    def add(self, product):
+        """Index a freshly committed product."""
+        if product.id > self.backend.high_water:
+            self.sync()  # Also fills any gap below this id
+        else:
+            self.backend.index(product)
+
+    def remove(self, product_id):
+        self.backend.remove(product_id)
+
+    def sync(self):
+        """Index any products newer than the backend's high-water mark."""
+        from app.models import Product
+
+        with self._sync_lock:
+            pending = Product.query.filter(Product.id > self.backend.high_water).order_by(Product.id).all()
+            for product in pending:
+                self.backend.index(product)
+
+    def search(self, text, limit=None):
+        self.sync()
+        return self.backend.search(text, limit)
+
+
+search_index = ProductSearch()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import tempfile
+from flask import url_for
+
+
+CHUNK_SIZE = 64 * 1024
+KEY_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]{1,5}$")
+
+
+def content_key(digest, extension):
+    """Storage key for content with the given sha256 hex digest, sharded two levels deep."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension.lower().lstrip('.')}"
+
+
+def digest_of(key):
+    """The content hash embedded in a storage key, or None if the key is not one of ours."""
+    match = KEY_RE.match(key or "")
+    return match.group(1) if match else None
+
+
+class StorageBackend:
+    """Interface for content-addressed file stores holding uploads and image variants."""
+
+    def put_bytes(self, data, extension):
+        """Store bytes and return their key; identical content always maps to the same key."""
+        raise NotImplementedError
+
+    def put_stream(self, stream, extension):
+        """Store a file-like object, hashing it chunk by chunk, and return its key."""
+        raise NotImplementedError
+
+    def open_temp(self):
+        """Return (file, path) for a new temp file that adopt_temp() can later turn into a stored file."""
+        raise NotImplementedError
+
+    def adopt_temp(self, temp_path, digest, extension):
+        """Store an already-hashed temp file under its content key and return the key."""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def path(self, key):
+        """Local filesystem path for a key (used by the image pipeline and the media route)."""
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Stores files under root/ab/cd/<sha256>.<ext>; a second upload of the same bytes is not written again."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._tmp = os.path.join(self.root, ".tmp")
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def put_bytes(self, data, extension):
+        key = content_key(hashlib.sha256(data).hexdigest(), extension)
+        if not self.exists(key):
+            f, tmp_path = self.open_temp()
+            with f:
+                f.write(data)
+            self._commit(tmp_path, key)
+        return key
+
+    def put_stream(self, stream, extension):
+        digest = hashlib.sha256()
+        f, tmp_path = self.open_temp()
+        try:
+            with f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return self.adopt_temp(tmp_path, digest.hexdigest(), extension)
+
+    def open_temp(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        return os.fdopen(fd, "w+b"), tmp_path
+
+    def adopt_temp(self, temp_path, digest, extension):
+        key = content_key(digest, extension)
+        if self.exists(key):
+            os.unlink(temp_path)  # Deduplicated: the content is already stored
+        else:
+            self._commit(temp_path, key)
+        return key
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def _commit(self, tmp_path, key):
+        final_path = self.path(key)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)  # Atomic, so readers never see a partial file
+
+
+class Storage:
+    """Application file store, currently a LocalStorage rooted at MEDIA_ROOT."""
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        self.backend = LocalStorage(app.config.get("MEDIA_ROOT", os.path.join("app", "media_store")))
+        app.extensions["storage"] = self
+
+    def put_bytes(self, data, extension):
+        return self.backend.put_bytes(data, extension)
+
+    def put_stream(self, stream, extension):
+        return self.backend.put_stream(stream, extension)
+
+    def open_temp(self):
+        return self.backend.open_temp()
+
+    def adopt_temp(self, temp_path, digest, extension):
+        return self.backend.adopt_temp(temp_path, digest, extension)
+
+    def exists(self, key):
+        return self.backend.exists(key)
+
+    def path(self, key):
+        return self.backend.path(key)
+
+
+def media_url(name):
+    """URL for an image: storage keys go through /media, legacy bare filenames through static/uploads."""
+    if digest_of(name):
+        return url_for("media.serve_media", key=name)
+    return url_for("static", filename="uploads/" + (name or "nb.png"))
+
+
+storage = Storage()
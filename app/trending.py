@@ -0,0 +1,238 @@
+import atexit
+import calendar
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from app.database import db
+
+
+logger = logging.getLogger(__name__)
+
+# Event kind -> score contribution at the moment it happens
+EVENT_WEIGHTS = {"interest": 3.0, "cart_add": 4.0, "review": 2.0, "chat_start": 5.0}
+
+# Stored scores are rebased once they grow past 2**REBASE_AT half-lives of headroom
+REBASE_AT = 500
+PRUNE_BELOW = 0.01  # decayed score under which a product drops out of the ranking
+
+
+class TrendingEngine:
+    """Time-decayed popularity scores kept in a ranked in-memory list.
+
+    Uses forward decay: an event at time t adds weight * 2**((t - epoch) / half_life)
+    to a product's stored score. Every stored score would shrink by the same
+    factor as time passes, so the order never changes and nothing needs
+    rescoring. Updates are a bisect plus an insort, and top(k) is a slice.
+
+    Every TRENDING_PERSIST_SECONDS each worker writes the share of the scores
+    that came from its own events to its own trending_score rows, keyed by
+    (product_id, worker), so workers never overwrite one another. Loading sums
+    every worker's rows, so a restart keeps the whole ranking. Between loads a
+    worker ranks the events it sees itself on top of what it loaded.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.half_life = 24 * 3600
+        self.epoch = time.time()
+        self.worker = None  # this process's key in trending_score, set on load
+        self._scores = {}  # product_id -> stored (forward-decayed) score
+        self._own = {}  # product_id -> the part of _scores this worker recorded since loading
+        self._ranked = []  # sorted (-stored score, product_id)
+        self._dirty = set()
+        self._forgotten = set()
+        self._seen = {}  # (kind, product_id, actor_id) -> when that actor last counted
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def init_app(self, app):
+        self.app = app
+        self.half_life = app.config.get("TRENDING_HALF_LIFE_HOURS", 24) * 3600
+        interval = app.config.get("TRENDING_PERSIST_SECONDS", 60)
+        if interval:
+            self._timer = threading.Thread(target=self._persist_loop, args=(interval,), name="trending-persist", daemon=True)
+            self._timer.start()
+            atexit.register(self._persist_once)  # Don't lose the last interval's events on shutdown
+        app.extensions["trending"] = self
+
+    def record(self, product_id, kind, actor_id=None):
+        """Apply one event.
+
+        Given an actor_id, the same actor's repeats of one kind on one product
+        count once per half-life, so un-interest and re-interest (or removing
+        and re-adding a cart line) can't pump a score. There is no retraction:
+        the event's weight at the time it happened is no longer known, and
+        subtracting today's larger weight would take away more than it added.
+        A removed interest simply decays like any other.
+        """
+        self._ensure_loaded()
+        now = time.time()
+        with self._lock:
+            if actor_id is not None:
+                key = (kind, product_id, actor_id)
+                if now - self._seen.get(key, -math.inf) < self.half_life:
+                    return
+                self._seen[key] = now
+            boost = EVENT_WEIGHTS[kind] * self._growth(now)
+            self._set(product_id, self._scores.get(product_id, 0.0) + boost)
+            self._own[product_id] = self._own.get(product_id, 0.0) + boost
+            self._dirty.add(product_id)
+
+    def top(self, k):
+        """The k highest-scoring (product_id, current score) pairs, best first."""
+        self._ensure_loaded()
+        decay = 1.0 / self._growth(time.time())
+        with self._lock:
+            return [(product_id, -stored * decay) for stored, product_id in self._ranked[:k]]
+
+    def score(self, product_id):
+        with self._lock:
+            return self._scores.get(product_id, 0.0) / self._growth(time.time())
+
+    def forget(self, product_id):
+        """Drop a product from the ranking (e.g. when it is deleted), every worker's rows included."""
+        with self._lock:
+            self._set(product_id, 0.0)
+            self._own.pop(product_id, None)
+            self._dirty.discard(product_id)
+            self._forgotten.add(product_id)
+
+    def persist(self):
+        """Write this worker's changed shares of the scores, as of now, to its trending_score rows."""
+        from app.models import TrendingScore
+
+        now = time.time()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            forgotten, self._forgotten = self._forgotten, set()
+            decay = 1.0 / self._growth(now)
+            rows = {product_id: self._own.get(product_id, 0.0) * decay for product_id in dirty}
+            rows.update({product_id: 0.0 for product_id in self._prune(decay)})
+            self._seen = {key: seen for key, seen in self._seen.items() if now - seen < self.half_life}
+            worker = self.worker
+        if not rows and not forgotten:
+            return 0
+
+        stamp = datetime.utcfromtimestamp(now)
+        try:
+            if forgotten:
+                TrendingScore.query.filter(TrendingScore.product_id.in_(forgotten)).delete(synchronize_session=False)
+            for product_id, value in rows.items():
+                if value < PRUNE_BELOW:
+                    TrendingScore.query.filter_by(product_id=product_id, worker=worker).delete()
+                else:
+                    db.session.merge(TrendingScore(product_id=product_id, worker=worker, score=value, computed_at=stamp))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self._dirty |= set(rows)  # Try again next round
+                self._forgotten |= forgotten
+            raise
+        return len(rows) + len(forgotten)
+
+    def load(self):
+        """Replace in-memory scores with the sum of every worker's persisted ones, decayed to the present.
+
+        Rows that have decayed away, such as those of workers that are gone, are deleted.
+        """
+        from app.models import TrendingScore
+
+        now = time.time()
+        with self._lock:
+            self.worker = self.worker or _worker_id()
+            self._scores, self._own, self._ranked, self._dirty = {}, {}, [], set()
+            self.epoch = now
+            totals, faded = {}, []
+            for row in TrendingScore.query.all():
+                age = max(now - calendar.timegm(row.computed_at.utctimetuple()), 0) if row.computed_at else 0
+                value = row.score * 2 ** (-age / self.half_life)
+                if value < PRUNE_BELOW:
+                    faded.append((row.product_id, row.worker))
+                    continue
+                totals[row.product_id] = totals.get(row.product_id, 0.0) + value
+                if row.worker == self.worker:
+                    self._own[row.product_id] = value
+            for product_id, total in totals.items():
+                self._set(product_id, total)
+            for product_id, worker in faded:
+                TrendingScore.query.filter_by(product_id=product_id, worker=worker).delete()
+            db.session.commit()
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                self.load()
+            except Exception:
+                db.session.rollback()
+                logger.warning("Could not load trending scores; starting empty", exc_info=True)
+                self._loaded = True
+
+    def _growth(self, now):
+        exponent = (now - self.epoch) / self.half_life
+        if exponent > REBASE_AT:
+            self._rebase(now)
+            exponent = 0.0
+        return 2 ** exponent
+
+    def _rebase(self, now):
+        # Keep stored values well inside float range by moving the epoch forward
+        with self._lock:
+            factor = 2 ** (-(now - self.epoch) / self.half_life)
+            self.epoch = now
+            self._scores = {pid: s * factor for pid, s in self._scores.items()}
+            self._own = {pid: s * factor for pid, s in self._own.items()}
+            self._ranked = sorted((-s, pid) for pid, s in self._scores.items())
+
+    def _set(self, product_id, stored):
+        old = self._scores.pop(product_id, None)
+        if old is not None:
+            index = bisect_left(self._ranked, (-old, product_id))
+            if index < len(self._ranked) and self._ranked[index] == (-old, product_id):
+                del self._ranked[index]
+        if stored > 0 and not math.isinf(stored):
+            self._scores[product_id] = stored
+            insort(self._ranked, (-stored, product_id))
+
+    def _prune(self, decay):
+        cutoff = PRUNE_BELOW / decay
+        pruned = []
+        while self._ranked and -self._ranked[-1][0] < cutoff:
+            _, product_id = self._ranked.pop()
+            del self._scores[product_id]
+            self._own.pop(product_id, None)
+            pruned.append(product_id)
+        return pruned
+
+    def _persist_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self._persist_once()
+
+    def _persist_once(self):
+        with self.app.app_context():
+            try:
+                self.persist()
+            except Exception:
+                logger.exception("Persisting trending scores failed")
+            finally:
+                db.session.remove()
+
+
+def _worker_id():
+    # A restarted worker that gets the same pid picks its old rows back up as its own
+    return f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+
+trending = TrendingEngine()
@@ -0,0 +1,65 @@
+import random
+from flask import current_app
+from app.extensions import cache
+from app.models import Message
+
+
+def cached_count(name, user_id, count):
+    """Return the user's cached `name` counter, calling count() for it when missing or outdated.
+
+    The count is cached with the counter's generation at the time it was
+    taken, and writes bump the generation (invalidate_count) rather than
+    adjust the count. A count taken while a write was committing is thus
+    stored under an old generation and recounted on the next read, instead of
+    being served until UNREAD_COUNT_TTL runs out.
+    """
+    generation = cache.get(_generation_key(name, user_id))
+    if generation is None:
+        generation = _new_generation(name, user_id)
+    cached = cache.get(_key(name, user_id))
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    value = count()
+    cache.set(_key(name, user_id), (generation, value), _ttl())
+    return value
+
+
+def invalidate_count(name, user_id):
+    """Make the next read of the user's `name` counter recount; call after the change is committed."""
+    if cache.incr(_generation_key(name, user_id)) is None:
+        _new_generation(name, user_id)
+
+
+def unread_count_for(user_id):
+    """Unread message count for a user, served from the cache and recounted after writes."""
+    return cached_count("unread", user_id, lambda: Message.query.filter_by(receiver_id=user_id, is_read=False).count())
+
+
+def message_received(user_id):
+    """Outdate a user's cached count after a message to them is committed."""
+    invalidate_count("unread", user_id)
+
+
+def messages_read(user_id, count):
+    """Outdate a user's cached count after `count` messages were marked read."""
+    if count:
+        invalidate_count("unread", user_id)
+
+
+def _key(name, user_id):
+    return f"{name}:{user_id}"
+
+
+def _generation_key(name, user_id):
+    return f"{name}-gen:{user_id}"
+
+
+def _new_generation(name, user_id):
+    # Random, so a counter whose generation was evicted never matches a count cached before
+    generation = random.getrandbits(62)
+    cache.set(_generation_key(name, user_id), generation, _ttl())
+    return generation
+
+
+def _ttl():
+    return current_app.config.get("UNREAD_COUNT_TTL", 60)
@@ -0,0 +1,117 @@
+import hashlib
+import os
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+
+# Leading bytes of the image formats we accept -> stored extension
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+SNIFF_BYTES = 12
+# File name extensions an upload may carry; sniff_image() has the final say on the contents
+ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
+
+
+def sniff_image(head):
+    """Return the extension for an image header, or None if it isn't an accepted image type."""
+    for magic, extension in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class ImageUploadSink:
+    """Writable target for one multipart file part.
+
+    Werkzeug writes the part here chunk by chunk as it comes off the socket. The
+    sink checks the magic bytes once the first few arrive and enforces
+    MAX_IMAGE_BYTES, aborting the request as soon as either check fails. It
+    hashes and spools the bytes into the storage temp area, so saving the
+    upload later is just a rename.
+    """
+
+    def __init__(self, temp_file, temp_path, max_bytes):
+        self._file = temp_file
+        self.temp_path = temp_path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.kind = None
+        self._head = b""
+        self._sha256 = hashlib.sha256()
+        self.adopted = False
+
+    @property
+    def digest(self):
+        return self._sha256.hexdigest()
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.close()  # The parser drops the part when we raise, so clean up here
+            raise RequestEntityTooLarge(f"Each image must be at most {self.max_bytes // (1024 * 1024)} MB.")
+
+        if self.kind is None and len(self._head) < SNIFF_BYTES:
+            self._head += chunk[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self.kind = sniff_image(self._head)
+                if self.kind is None:
+                    self.close()
+                    raise UnsupportedMediaType("Only JPEG, PNG, GIF and WebP images can be uploaded.")
+
+        self._sha256.update(chunk)
+        return self._file.write(chunk)
+
+    def finish(self):
+        """Validate a part shorter than the sniff window once it is complete."""
+        if self.size and self.kind is None:
+            self.kind = sniff_image(self._head)
+            if self.kind is None:
+                raise UnsupportedMediaType("Only JPEG, PNG, GIF and WebP images can be uploaded.")
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.adopted and os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)  # Never saved, so don't leave it in the temp area
+
+
+class UploadRequest(Request):
+    """Request class whose multipart file parts stream through an ImageUploadSink."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        from app.storage import storage
+
+        temp_file, temp_path = storage.open_temp()
+        return ImageUploadSink(temp_file, temp_path, current_app.config.get("MAX_IMAGE_BYTES"))
+
+
+def save_image_upload(file_storage):
+    """Move a streamed image part into content-addressed storage and return its key; None for an empty part."""
+    from app.storage import storage
+
+    sink = file_storage.stream
+    if not isinstance(sink, ImageUploadSink) or sink.size == 0:
+        return None
+
+    sink.finish()
+    sink.adopted = True
+    sink.close()
+    return storage.adopt_temp(sink.temp_path, sink.digest, sink.kind)
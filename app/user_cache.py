@@ -0,0 +1,44 @@
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from app.database import db
+from app.extensions import cache
+from app.models import User
+
+
+# Columns cached per user; anything else (e.g. password_hash) is loaded from the database only if touched
+CACHED_FIELDS = ("id", "username", "email")
+
+
+def _key(user_id):
+    return f"user:{user_id}"
+
+
+def load_cached_user(user_id):
+    """Flask-Login user_loader backed by the cache, so polling requests authenticate without a query.
+
+    A hit rebuilds a detached User from the cached columns and merges it into the
+    session without loading, giving the request a normal persistent instance.
+    """
+    fields = cache.get(_key(user_id))
+    if fields is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            cache.set(_key(user_id), {name: getattr(user, name) for name in CACHED_FIELDS},
+                      current_app.config.get("USER_CACHE_TTL", 300))
+        return user
+
+    user = User(**fields)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_user(user_id):
+    """Forget a user's cached identity (logout, password or profile change)."""
+    cache.delete(_key(user_id))
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
@@ -0,0 +1,33 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import tempfile
+
+
+def percentile(sorted_values, pct):
+    """The pct-th percentile (nearest rank) of an already sorted list; 0.0 when it is empty."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class TempDatabase:
+    """A throwaway SQLite database file inside its own private temporary directory.
+
+    cleanup() (or leaving a `with` block) removes the directory and everything
+    SQLite left in it, journal files included.
+    """
+
+    def __init__(self):
+        self._directory = tempfile.TemporaryDirectory(prefix="campus-bench-")
+        self.path = os.path.join(self._directory.name, "bench.db")
+        self.uri = "sqlite:///" + self.path
+
+    def cleanup(self):
+        self._directory.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
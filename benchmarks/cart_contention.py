@@ -0,0 +1,177 @@
+"""Stress the cart's stock holds with concurrent buyers fighting over a few listings.
+
+Boots the app on a throwaway SQLite database, gives each of --threads clients
+its own logged-in buyer, and has them add to and remove from their carts on
+--products listings of --stock units each, most traffic going to the first
+("hot") one. A --batch-share of the changes go through POST /cart/batch as a
+few add/set/remove operations at once. Every --retry-every'th add is sent twice with the same
+Idempotency-Key, as a client retrying a timed-out request would. Afterwards
+it checks that no listing was oversold, that stock plus held quantities adds
+up to what was listed, that no buyer has two lines for one listing and that
+every retry of a successful add was answered from the stored response. Exits 1 if any check fails.
+
+    python benchmarks/cart_contention.py --threads 32 --ops 50 --stock 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._common import TempDatabase, percentile  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def run(args):
+    from sqlalchemy import func
+    from app import create_app
+    from app.database import db
+    from app.models import Cart, Product, User
+
+    database = TempDatabase()
+
+    class ContentionConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database.uri
+        SECRET_KEY = "cart-bench"
+        BCRYPT_SYNC = True
+        BCRYPT_LOG_ROUNDS = 4
+        RATELIMIT_ENABLED = False  # Every client shares one IP here
+        TRENDING_PERSIST_SECONDS = 0
+        NOTIFICATIONS_SYNC = True
+        DB_POOL_SIZE = args.threads
+        RESERVATION_RETRIES = args.retries
+
+    app = create_app(ContentionConfig)
+    with app.app_context():
+        db.create_all()
+        seller = User(username="seller", email="seller@example.com")
+        seller.set_password("pw")
+        db.session.add(seller)
+        for n in range(args.threads):
+            buyer = User(username=f"buyer{n}", email=f"buyer{n}@example.com")
+            buyer.set_password("pw")
+            db.session.add(buyer)
+        db.session.flush()
+        product_ids = []
+        for n in range(args.products):
+            product = Product(name=f"Listing {n}", category="Books", description="bench", price=10.0,
+                              color="red", quantity_available=args.stock, condition="good", user_id=seller.id)
+            db.session.add(product)
+            db.session.flush()
+            product_ids.append(product.id)
+        db.session.commit()
+
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    replay_mismatches = []
+
+    def client_loop(n):
+        client = app.test_client()
+        client.post("/auth/login", data={"email": f"buyer{n}@example.com", "password": "pw"})
+        rng = random.Random(n)
+        lines = {}  # product id -> cart line id, from add responses
+        for op in range(args.ops):
+            product_id = product_ids[0] if rng.random() < args.hot_share else rng.choice(product_ids)
+            started = time.perf_counter()
+            if rng.random() < args.batch_share:
+                operations = [
+                    {"op": rng.choice(("add", "set", "remove")), "product_id": rng.choice(product_ids),
+                     "quantity": rng.randint(1, 2)}
+                    for _ in range(rng.randint(2, 4))
+                ]
+                response = client.post("/cart/batch", json={"operations": operations})
+                if response.status_code == 200:
+                    lines = {item["product_id"]: item["id"] for item in response.get_json()["cart"]}
+            elif rng.random() < args.remove_share:
+                if product_id not in lines:
+                    continue
+                response = client.delete(f"/cart/remove/{lines.pop(product_id)}")
+            else:
+                key = f"{n}-{op}"
+                body = {"quantity": rng.randint(1, 2)}
+                response = client.post(f"/cart/add/{product_id}", json=body, headers={"Idempotency-Key": key})
+                if response.status_code == 200:
+                    lines[product_id] = response.get_json()["cart_id"]
+                if op % args.retry_every == 0 and response.status_code == 200:
+                    retry = client.post(f"/cart/add/{product_id}", json=body, headers={"Idempotency-Key": key})
+                    if retry.headers.get("Idempotent-Replayed") != "true" or retry.get_data() != response.get_data():
+                        with lock:
+                            replay_mismatches.append(key)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    failures = []
+    with app.app_context():
+        for product_id in product_ids:
+            stock = db.session.get(Product, product_id).quantity_available
+            held = db.session.query(func.coalesce(func.sum(Cart.quantity), 0)).filter(
+                Cart.product_id == product_id, Cart.reserved_until.isnot(None)
+            ).scalar()
+            if stock < 0:
+                failures.append(f"product {product_id} oversold: stock {stock}")
+            if stock + held != args.stock:
+                failures.append(f"product {product_id}: stock {stock} + held {held} != listed {args.stock}")
+        duplicates = db.session.query(Cart.user_id, Cart.product_id).group_by(
+            Cart.user_id, Cart.product_id
+        ).having(func.count(Cart.id) > 1).count()
+        if duplicates:
+            failures.append(f"{duplicates} duplicate cart line(s)")
+        db.engine.dispose()
+    database.cleanup()
+    failures += [f"retry {key} was not replayed" for key in replay_mismatches]
+
+    latencies.sort()
+    return {
+        "threads": args.threads,
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "latency_ms": {p: round(percentile(latencies, int(p[1:])) * 1000, 1) for p in ("p50", "p95", "p99")},
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32, help="concurrent buyers")
+    parser.add_argument("--ops", type=int, default=50, help="cart changes per buyer")
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=20, help="units listed per product")
+    parser.add_argument("--hot-share", type=float, default=0.8, help="share of traffic on the first listing")
+    parser.add_argument("--batch-share", type=float, default=0.2, help="share of changes sent as a /cart/batch")
+    parser.add_argument("--remove-share", type=float, default=0.3, help="share of single changes that remove a line")
+    parser.add_argument("--retry-every", type=int, default=5, help="resend every Nth add with its Idempotency-Key")
+    parser.add_argument("--retries", type=int, default=Config.RESERVATION_RETRIES)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        lat = result["latency_ms"]
+        print(f"{result['threads']} buyers, {result['requests']} cart changes, {result['requests_per_sec']} req/s")
+        print(f"statuses {result['statuses']}  p50 {lat['p50']} ms  p95 {lat['p95']} ms  p99 {lat['p99']} ms")
+        for failure in result["failures"]:
+            print(f"FAIL {failure}")
+        if not result["failures"]:
+            print("ok: no overselling, stock and holds balance, no duplicate lines, every retry replayed")
+    sys.exit(1 if result["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""End-to-end benchmark of the hot endpoints, with machine-readable results.
+
+Seeds a throwaway SQLite database with --users, --products, --messages,
+--interests and --reviews, then, for each endpoint in turn, has --threads
+logged-in clients send it --requests requests each. Requests go through the
+Flask test client, a threaded WSGI server over real HTTP, or both (--transport).
+Reports p50/p95/p99 latency, throughput and SQL statements per request
+(from the X-SQL-Statements header) per endpoint and transport.
+
+    python benchmarks/harness.py --threads 8 --requests 50 --output run.json
+    python benchmarks/harness.py --compare run.json          # this run against an earlier one
+
+--output writes the report as JSON: run metadata (arguments, seed sizes, git
+revision) and one result object per endpoint and transport. --compare prints
+the relative change of each metric against such a file.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._common import TempDatabase, percentile  # noqa: E402
+from config import Config  # noqa: E402
+
+
+PASSWORD = "bench-password"
+WORDS = ["blue", "calculus", "desk", "lamp", "guitar", "laptop", "novel", "chair", "bike", "kettle",
+         "jacket", "camera", "poster", "monitor", "backpack", "football", "textbook", "printer"]
+CATEGORIES = ["Books", "Electronics", "Furniture", "Clothing", "Sports"]
+SORTS = ["", "price_asc", "newest", "interested_desc", "rating_desc"]
+
+
+class ClientState:
+    """What one simulated user knows: who they are, who they talk to, the last badge ETag."""
+
+    def __init__(self, user_id, peers, product_ids, seed):
+        self.user_id = user_id
+        self.peers = peers
+        self.product_ids = product_ids  # Listings by other users
+        self.rng = random.Random(seed)
+        self.etag = None
+
+
+# name -> (build the request from a ClientState, statuses that count as success)
+ENDPOINTS = {
+    "products_all": (
+        lambda s: ("GET", f"/products/all?limit=24&sort={s.rng.choice(SORTS)}"
+                          f"{'&category=' + s.rng.choice(CATEGORIES) if s.rng.random() < 0.3 else ''}", None),
+        (200,),
+    ),
+    "products_search": (
+        lambda s: ("GET", f"/products/search?query={s.rng.choice(WORDS)}", None),
+        (200,),
+    ),
+    "unread_count": (
+        lambda s: ("GET", "/unread_count", None),  # Sends If-None-Match like a polling badge
+        (200, 304),
+    ),
+    "history": (
+        lambda s: ("GET", "/history", None),
+        (200,),
+    ),
+    "conversation": (
+        lambda s: ("GET", f"/{s.rng.choice(s.peers)}", None),
+        (200,),
+    ),
+    "cart_add": (
+        lambda s: ("POST", f"/cart/add/{s.rng.choice(s.product_ids)}", {"quantity": 1}),
+        (200,),
+    ),
+}
+
+
+def build_app(args, db_uri):
+    from app import create_app
+
+    class HarnessConfig(Config):
+        SQLALCHEMY_DATABASE_URI = db_uri
+        SECRET_KEY = "harness"
+        SQL_STATEMENTS_HEADER = True
+        RESPONSE_CACHE_ENABLED = args.cache  # Off by default so every request does its real work
+        RATELIMIT_ENABLED = False  # Every client logs in from one IP
+        BCRYPT_SYNC = True
+        BCRYPT_LOG_ROUNDS = 4
+        DB_POOL_SIZE = max(Config.DB_POOL_SIZE, args.threads)
+        TRENDING_PERSIST_SECONDS = 0
+        NOTIFICATIONS_SYNC = True
+        IMAGE_PROCESSING_SYNC = True
+
+    return create_app(HarnessConfig)
+
+
+def seed(app, args):
+    """Bulk-load the database; returns {user_id: [peer ids]} and {product_id: seller id}."""
+    from sqlalchemy import insert
+    from app.counters import reconcile_interest_counts, reconcile_ratings
+    from app.database import db
+    from app.extensions import hasher
+    from app.models import Interest, Message, Product, Review, User
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    with app.app_context():
+        db.create_all()
+        password_hash = hasher.hash(PASSWORD)
+        db.session.execute(insert(User), [
+            {"id": n, "username": f"user{n}", "email": f"user{n}@example.com", "password_hash": password_hash}
+            for n in range(1, args.users + 1)
+        ])
+        sellers = {n: rng.randint(1, args.users) for n in range(1, args.products + 1)}
+        db.session.execute(insert(Product), [
+            {"id": n, "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {n}",
+             "category": rng.choice(CATEGORIES), "description": " ".join(rng.sample(WORDS, 5)),
+             "price": float(rng.randint(50, 5000)), "color": rng.choice(["red", "blue", "black", "white"]),
+             "quantity_available": args.stock, "condition": rng.choice(["new", "good", "used"]),
+             "user_id": sellers[n], "created_at": now - timedelta(minutes=n)}
+            for n in range(1, args.products + 1)
+        ])
+
+        peers = {}
+        messages = []
+        for n in range(args.messages):
+            sender, receiver = rng.sample(range(1, args.users + 1), 2)
+            peers.setdefault(sender, set()).add(receiver)
+            peers.setdefault(receiver, set()).add(sender)
+            messages.append({"sender_id": sender, "receiver_id": receiver, "message": " ".join(rng.sample(WORDS, 6)),
+                             "timestamp": now - timedelta(seconds=args.messages - n), "is_read": rng.random() < 0.7})
+        if messages:
+            db.session.execute(insert(Message), messages)
+
+        pairs = set()
+        while len(pairs) < min(args.interests, args.users * args.products):
+            pairs.add((rng.randint(1, args.users), rng.randint(1, args.products)))
+        if pairs:
+            db.session.execute(insert(Interest), [
+                {"user_id": user_id, "product_id": product_id, "seen": False} for user_id, product_id in pairs
+            ])
+        if args.reviews:
+            db.session.execute(insert(Review), [
+                {"user_id": rng.randint(1, args.users), "product_id": rng.randint(1, args.products),
+                 "rating": rng.randint(1, 5), "comment": " ".join(rng.sample(WORDS, 8)),
+                 "created_at": now - timedelta(minutes=n)}
+                for n in range(args.reviews)
+            ])
+        db.session.commit()
+        reconcile_interest_counts()
+        reconcile_ratings()  # Stored counters and rating aggregates match the rows just inserted
+        db.session.remove()
+
+    return {user_id: sorted(ids) for user_id, ids in peers.items()}, sellers
+
+
+class TestClientTransport:
+    name = "client"
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, body=None, headers=None, form=None):
+            response = client.open(path, method=method, json=body, data=form, headers=headers or {})
+            return response.status_code, response.headers
+        return send
+
+
+class HTTPTransport:
+    """Real HTTP against a threaded werkzeug server on a free local port."""
+    name = "http"
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def session(self):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+        def send(method, path, body=None, headers=None, form=None):
+            headers = dict(headers or {})
+            data = None
+            if form is not None:
+                data = urllib.parse.urlencode(form).encode()
+            elif body is not None:
+                data = json.dumps(body).encode()
+                headers["Content-Type"] = "application/json"
+            request = urllib.request.Request(self.base + path, data=data, method=method, headers=headers)
+            try:
+                with opener.open(request) as response:
+                    response.read()
+                    return response.status, response.headers
+            except urllib.error.HTTPError as error:
+                error.read()
+                return error.code, error.headers
+        return send
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_endpoint(transport, name, args, peers, sellers):
+    build, ok_statuses = ENDPOINTS[name]
+    latencies, statements, statuses = [], [], {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads + 1)
+
+    def client_loop(n):
+        user_id = n % args.users + 1
+        state = ClientState(
+            user_id, peers.get(user_id) or [user_id % args.users + 1],
+            [product_id for product_id, seller in sellers.items() if seller != user_id],
+            seed=args.seed * 1000 + n,
+        )
+        send = transport.session()
+        try:
+            login(send, user_id)
+            for _ in range(args.warmup):
+                _request(send, build, state)
+        except Exception:
+            barrier.abort()  # Don't leave the others waiting for this client
+            raise
+        barrier.wait()
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            status, headers = _request(send, build, state)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                if headers.get("X-SQL-Statements") is not None:
+                    statements.append(int(headers["X-SQL-Statements"]))
+        barrier.wait()
+
+    threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()  # Everyone is logged in and warmed up
+    started = time.perf_counter()
+    barrier.wait()
+    elapsed = time.perf_counter() - started
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "transport": transport.name,
+        "threads": args.threads,
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status not in ok_statuses),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            **{p: round(percentile(latencies, int(p[1:])) * 1000, 2) for p in ("p50", "p95", "p99")},
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "sql_per_request": {
+            "mean": round(sum(statements) / len(statements), 2) if statements else None,
+            "max": max(statements) if statements else None,
+        },
+    }
+
+
+def login(send, user_id):
+    status, _ = send("POST", "/auth/login", form={"email": f"user{user_id}@example.com", "password": PASSWORD})
+    if status not in (200, 302):
+        raise RuntimeError(f"Logging in user{user_id} failed with {status}")
+
+
+def _request(send, build, state):
+    method, path, body = build(state)
+    headers = {"If-None-Match": state.etag} if state.etag and path == "/unread_count" else None
+    status, response_headers = send(method, path, body, headers)
+    if path == "/unread_count" and response_headers.get("ETag"):
+        state.etag = response_headers["ETag"]
+    return status, response_headers
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print each metric's change from a baseline report, matched by endpoint and transport."""
+    before = {(r["endpoint"], r["transport"]): r for r in baseline["results"]}
+    print(f"\nagainst {baseline['meta'].get('git_revision') or 'baseline'} ({baseline['meta'].get('started_at')})")
+    print(f"{'endpoint':<16} {'via':<6} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'sql':>9}")
+    for result in report["results"]:
+        old = before.get((result["endpoint"], result["transport"]))
+        if old is None:
+            continue
+        cells = [_change(old["throughput_rps"], result["throughput_rps"])]
+        cells += [_change(old["latency_ms"][p], result["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        cells.append(_change(old["sql_per_request"]["mean"], result["sql_per_request"]["mean"]))
+        print(f"{result['endpoint']:<16} {result['transport']:<6} " + " ".join(f"{cell:>9}" for cell in cells))
+
+
+def _change(old, new):
+    if old is None or new is None:
+        return "-"
+    if not old:
+        return "0%" if not new else "new"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--interests", type=int, default=5000)
+    parser.add_argument("--reviews", type=int, default=5000)
+    parser.add_argument("--stock", type=int, default=100000, help="units seeded per product, so cart adds keep succeeding")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients per endpoint")
+    parser.add_argument("--requests", type=int, default=50, help="measured requests per client and endpoint")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per client first")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"comma-separated subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--transport", choices=["client", "http", "both"], default="client")
+    parser.add_argument("--cache", action="store_true", help="leave the response cache on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="print the JSON report instead of a table")
+    args = parser.parse_args()
+
+    endpoints = [name for name in args.endpoints.split(",") if name]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+    from app.database import db
+
+    database = TempDatabase()
+    app = build_app(args, database.uri)
+    seed_started = time.perf_counter()
+    peers, sellers = seed(app, args)
+    report = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "seed_seconds": round(time.perf_counter() - seed_started, 2),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "json")},
+        },
+        "results": [],
+    }
+
+    transports = [TestClientTransport(app)] if args.transport in ("client", "both") else []
+    if args.transport in ("http", "both"):
+        transports.append(HTTPTransport(app))
+    try:
+        for transport in transports:
+            for name in endpoints:
+                report["results"].append(run_endpoint(transport, name, args, peers, sellers))
+    finally:
+        for transport in transports:
+            if hasattr(transport, "close"):
+                transport.close()
+        with app.app_context():
+            db.engine.dispose()
+        database.cleanup()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.threads} clients x {args.requests} requests per endpoint; seeded {args.users} users, "
+              f"{args.products} products, {args.messages} messages in {report['meta']['seed_seconds']}s")
+        print(f"{'endpoint':<16} {'via':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8} {'errors':>7}")
+        for r in report["results"]:
+            lat = r["latency_ms"]
+            sql = r["sql_per_request"]["mean"]
+            print(f"{r['endpoint']:<16} {r['transport']:<6} {r['throughput_rps']:>8} {lat['p50']:>8} {lat['p95']:>8} "
+                  f"{lat['p99']:>8} {sql if sql is not None else '-':>8} {r['errors']:>7}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
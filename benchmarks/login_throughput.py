@@ -0,0 +1,112 @@
+"""Measure login throughput against the size of the bcrypt process pool.
+
+For each --pool-sizes entry, boots the app on a throwaway SQLite database and
+has --threads concurrent clients POST /auth/login. An "inline" row runs
+bcrypt on the request threads for comparison. Reports logins per second,
+latency percentiles and how many attempts admission control refused (503).
+
+    python benchmarks/login_throughput.py --pool-sizes 1,2,4 --threads 16 --rounds 10
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._common import TempDatabase, percentile  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def run(workers, args):
+    from app import create_app
+    from app.database import db
+    from app.extensions import hasher
+    from app.models import User
+
+    database = TempDatabase()
+
+    class LoginConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database.uri
+        SECRET_KEY = "login-bench"
+        BCRYPT_LOG_ROUNDS = args.rounds
+        BCRYPT_SYNC = workers is None
+        BCRYPT_WORKERS = workers
+        BCRYPT_MAX_PENDING = args.max_pending
+        TRENDING_PERSIST_SECONDS = 0
+        NOTIFICATIONS_SYNC = True
+        RATELIMIT_ENABLED = False  # Every client shares one IP here
+
+    hasher.shutdown()
+    app = create_app(LoginConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", email="bench@example.com")
+        user.set_password("correct horse")  # Also starts the pool's worker processes
+        db.session.add(user)
+        db.session.commit()
+
+    latencies, statuses = [], []
+
+    def client_loop():
+        client = app.test_client()
+        for _ in range(args.logins):
+            started = time.perf_counter()
+            response = client.post("/auth/login", data={"email": "bench@example.com", "password": "correct horse"})
+            latencies.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=client_loop) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        db.engine.dispose()
+    hasher.shutdown()
+    database.cleanup()
+
+    latencies.sort()
+    ok = sum(1 for status in statuses if status == 302)
+    return {
+        "pool": "inline" if workers is None else workers,
+        "attempts": len(statuses),
+        "logins": ok,
+        "rejected": sum(1 for status in statuses if status == 503),
+        "logins_per_sec": round(ok / elapsed, 1),
+        "latency_ms": {p: round(percentile(latencies, int(p[1:])) * 1000, 1) for p in ("p50", "p95", "p99")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--logins", type=int, default=10, help="logins per client")
+    parser.add_argument("--rounds", type=int, default=Config.BCRYPT_LOG_ROUNDS)
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--no-inline", action="store_true", help="skip the inline baseline")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    sizes = ([] if args.no_inline else [None]) + [int(n) for n in args.pool_sizes.split(",") if n]
+    results = [run(size, args) for size in sizes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.threads} clients x {args.logins} logins, bcrypt cost {args.rounds}")
+    print(f"{'pool':>7} {'ok':>5} {'503':>5} {'login/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        lat = r["latency_ms"]
+        print(f"{r['pool']:>7} {r['logins']:>5} {r['rejected']:>5} {r['logins_per_sec']:>8} "
+              f"{lat['p50']:>8} {lat['p95']:>8} {lat['p99']:>8}")
+
+
+if __name__ == "__main__":
+    main()
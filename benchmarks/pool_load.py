@@ -0,0 +1,141 @@
+"""Drive the app from concurrent worker threads and report connection pool behaviour.
+
+Seeds a throwaway SQLite database, then has --workers threads replay a mix of
+read endpoints through the Flask test client. Prints latency percentiles,
+throughput and the pool metrics (checkouts, waits, overflow, timeouts).
+
+    python benchmarks/pool_load.py --workers 32 --pool-size 4 --max-overflow 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._common import TempDatabase, percentile  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def build_app(args, db_uri):
+    from app import create_app
+
+    class LoadConfig(Config):
+        SQLALCHEMY_DATABASE_URI = db_uri
+        SECRET_KEY = "pool-load"
+        DB_POOL_SIZE = args.pool_size
+        DB_MAX_OVERFLOW = args.max_overflow
+        DB_POOL_TIMEOUT = args.pool_timeout
+        RESPONSE_CACHE_ENABLED = args.cache  # Off by default so every request reaches the pool
+        TRENDING_PERSIST_SECONDS = 0
+        NOTIFICATIONS_SYNC = True
+        IMAGE_PROCESSING_SYNC = True
+
+    return create_app(LoadConfig)
+
+
+def seed(app, products):
+    from app.database import db
+    from app.models import User, Product
+
+    with app.app_context():
+        db.create_all()
+        seller = User(username="seller", email="seller@example.com", password_hash="x")
+        db.session.add(seller)
+        db.session.flush()
+        categories = ["Books", "Electronics", "Furniture", "Clothing", "Sports"]
+        db.session.add_all([
+            Product(name=f"Item {i}", category=categories[i % len(categories)], description="Seeded for load testing",
+                    price=float(10 + i % 500), color="blue", quantity_available=1 + i % 5, condition="good",
+                    user_id=seller.id)
+            for i in range(products)
+        ])
+        db.session.commit()
+
+
+def worker(app, paths, requests_per_worker, latencies, errors):
+    client = app.test_client()
+    for _ in range(requests_per_worker):
+        path = random.choice(paths)
+        started = time.perf_counter()
+        try:
+            status = client.get(path).status_code
+        except Exception:
+            status = None
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            errors.append((path, status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="requests per worker")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=Config.DB_POOL_SIZE)
+    parser.add_argument("--max-overflow", type=int, default=Config.DB_MAX_OVERFLOW)
+    parser.add_argument("--pool-timeout", type=float, default=Config.DB_POOL_TIMEOUT)
+    parser.add_argument("--cache", action="store_true", help="leave the response cache on")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    from app.database import db
+    from app.db_pool import pool_metrics
+
+    database = TempDatabase()
+    app = build_app(args, database.uri)
+    seed(app, args.products)
+    pool_metrics.reset()
+
+    paths = [
+        "/products/all?limit=24",
+        "/products/all?limit=24&sort=price_asc",
+        "/products/all?limit=24&category=Books",
+        "/products/categories",
+        "/products/search?query=item",
+    ] + [f"/products/product/{i}" for i in random.sample(range(1, args.products + 1), 20)]
+
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=worker, args=(app, paths, args.requests, latencies, errors))
+        for _ in range(args.workers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        pool = pool_metrics.snapshot(db.engine.pool)
+        db.engine.dispose()
+    database.cleanup()
+
+    latencies.sort()
+    report = {
+        "workers": args.workers,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {p: round(percentile(latencies, int(p[1:])) * 1000, 2) for p in ("p50", "p95", "p99")},
+        "pool": pool,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['requests']} requests from {args.workers} workers in {report['seconds']}s "
+          f"({report['throughput_rps']} req/s, {report['errors']} errors)")
+    print("latency ms: " + ", ".join(f"{k}={v}" for k, v in report["latency_ms"].items()))
+    print(f"pool: size={pool.get('pool_size')} max_overflow={pool.get('max_overflow')} "
+          f"checkouts={pool['checkouts']} timeouts={pool['timeouts']} "
+          f"wait ms avg={pool['wait_ms']['avg']} p95={pool['wait_ms']['p95']} max={pool['wait_ms']['max']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,4 +9,112 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY")
-    UPLOAD_FOLDER = os.path.join("app", "static", "uploads")
\ No newline at end of file
+
+    # Connection pool for the application's single engine (app.db_pool builds SQLALCHEMY_ENGINE_OPTIONS)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE = 1800  # reconnect before MySQL's wait_timeout closes idle connections
+    DB_POOL_PRE_PING = True
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 5000))
+    # Password hashing (app.hashing): bcrypt cost and the process pool it runs on.
+    # Raising BCRYPT_LOG_ROUNDS upgrades each user's hash at their next login.
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", 0)) or None  # default: one per CPU
+    BCRYPT_MAX_PENDING = None  # hashes queued or running before new ones are refused; default 4 per worker
+    BCRYPT_ADMISSION_TIMEOUT = 0.5  # seconds to wait for a slot before answering 503
+    BCRYPT_SYNC = False
+    HASHING_METRICS_ENABLED = os.getenv("HASHING_METRICS_ENABLED") == "1"  # serves /metrics/hashing
+
+    # Login throttling (app.ratelimit), checked before any password hashing
+    RATELIMIT_ENABLED = True
+    RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "memory")  # "redis" shares windows across workers
+    RATELIMIT_URL = os.getenv("RATELIMIT_URL")  # defaults to CACHE_URL
+    RATELIMIT_MAX_KEYS = 100000
+    LOGIN_IP_LIMIT = 30  # attempts per client IP...
+    LOGIN_IP_WINDOW = 300  # ...per this many seconds
+    LOGIN_EMAIL_FAILURE_LIMIT = 5  # failed attempts per account...
+    LOGIN_EMAIL_WINDOW = 900  # ...per this many seconds
+
+    # Read replicas (app.replicas): comma-separated URLs; GET requests read from them, writes go to the primary.
+    # Two SQLite files work for local testing (`flask sync-replicas` copies the primary over them).
+    SQLALCHEMY_REPLICA_URIS = [u for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u]
+    REPLICA_STICKY_SECONDS = 10  # after a write, that client reads from the primary for this long
+    DB_POOL_METRICS_ENABLED = os.getenv("DB_POOL_METRICS_ENABLED") == "1"  # serves /metrics/db-pool
+    SQL_STATEMENTS_HEADER = False  # X-SQL-Statements on every response (always on in debug and testing)
+
+    UPLOAD_FOLDER = os.path.join("app", "static", "uploads")  # Legacy uploads; new files go to MEDIA_ROOT
+    MEDIA_ROOT = os.getenv("MEDIA_ROOT", os.path.join("app", "media_store"))
+
+    # Chat push delivery (app.pubsub); leave the URL unset for the in-process broker
+    PUBSUB_BROKER_URL = os.getenv("PUBSUB_BROKER_URL")
+    CHAT_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+    CHAT_STREAM_MAX_SECONDS = 300  # streams close after this long; EventSource reconnects
+    MESSAGE_PAGE_SIZE = 50  # messages per page of conversation history
+
+    # Application cache (app.cache); use "redis" with CACHE_URL to share it across workers
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_URL = os.getenv("CACHE_URL")
+    CACHE_DEFAULT_TTL = 300
+    CACHE_MAX_ENTRIES = 10000
+    USER_CACHE_TTL = 300  # seconds a logged-in user's identity is served without a query
+    UNREAD_COUNT_TTL = 60  # seconds a cached unread badge count may live before a recount
+    # Unread counts (app.unread) are only kept right across workers by a shared cache: run several with "redis"
+    FACET_CACHE_TTL = 300  # listing writes invalidate sooner
+    FACET_HTTP_MAX_AGE = 60
+
+    # Whole-response cache for anonymous product pages (app.response_cache); "filesystem" shares it per host
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", os.path.join("instance", "response_cache"))
+    RESPONSE_CACHE_MAX_ENTRIES = 2000
+    RESPONSE_CACHE_TTL = 60  # seconds a response is served as fresh
+    RESPONSE_CACHE_STALE_TTL = 300  # then served stale for this long while it is rebuilt in the background
+
+    # Listing image variants (app.images)
+    IMAGE_WORKERS = 2
+    IMAGE_PROCESSING_SYNC = False
+
+    # Bayesian rating prior: new products behave as if they had this many reviews of this many stars
+    RATING_PRIOR_WEIGHT = 5
+    RATING_PRIOR_MEAN = 3.5
+
+    # Trending ranking (app.trending): how fast activity fades and how often scores are saved
+    TRENDING_HALF_LIFE_HOURS = 24
+    TRENDING_PERSIST_SECONDS = 60
+    TRENDING_DEFAULT_LIMIT = 12
+
+    # Notification writes (app.notifier) are queued and flushed in batches
+    NOTIFICATIONS_SYNC = False
+    NOTIFICATION_BATCH_SIZE = 200
+    NOTIFICATION_FLUSH_SECONDS = 1.0
+    NOTIFICATION_QUEUE_SIZE = 10000
+    NOTIFICATION_PAGE_SIZE = 20
+
+    # Cart stock holds (app.reservations): adding to the cart takes the quantity out of stock until the hold lapses
+    CART_HOLD_SECONDS = 15 * 60
+    RESERVATION_SWEEP_SECONDS = 60  # how often cart writes also release every lapsed hold (or `flask release-expired-holds`)
+    RESERVATION_RETRIES = 8  # attempts at a cart change that keeps losing races before answering 503
+    CART_BATCH_MAX_OPERATIONS = 100  # per POST /cart/batch
+    IDEMPOTENCY_KEY_TTL_HOURS = 24  # how long an Idempotency-Key's response is kept for replays
+    IDEMPOTENCY_LEASE_SECONDS = 30  # after this a key whose response was never stored (worker died) can be reused
+
+    # Upload limits; requests over MAX_CONTENT_LENGTH are refused before the body is read
+    MAX_IMAGE_BYTES = 8 * 1024 * 1024
+    MAX_IMAGES_PER_LISTING = 8
+    # A full set of images plus room for the other form fields and multipart framing
+    MAX_CONTENT_LENGTH = MAX_IMAGE_BYTES * MAX_IMAGES_PER_LISTING + 1024 * 1024
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.getenv("TEST_DATABASE_URL", "sqlite://")
+    SECRET_KEY = "testing"
+    WTF_CSRF_ENABLED = False
+    # Requests issuing more statements than this fail loudly (see app.query_budget)
+    SQLALCHEMY_MAX_QUERIES_PER_REQUEST = 10
+    IMAGE_PROCESSING_SYNC = True
+    TRENDING_PERSIST_SECONDS = 0  # Persist only when asked
+    NOTIFICATIONS_SYNC = True
+    BCRYPT_SYNC = True
+    BCRYPT_LOG_ROUNDS = 4  # Fast hashes; production cost is exercised by benchmarks/login_throughput.py
@@ -0,0 +1,37 @@
+"""Add product_image table for multi-image listings
+
+Revision ID: 2d7f81b9e4c3
+Revises: f0a93b7c2d61
+Create Date: 2026-10-18 15:52:09.364127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7f81b9e4c3'
+down_revision = 'f0a93b7c2d61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_image',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('image', sa.String(length=255), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_image_product_id'), ['product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_image_product_id'))
+
+    op.drop_table('product_image')
@@ -0,0 +1,32 @@
+"""Restore interested_count on Product as a maintained counter
+
+Revision ID: 5a2f9c1e7b34
+Revises: 78245b04023d
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a2f9c1e7b34'
+down_revision = '78245b04023d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('interested_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from existing interests; `flask repair-interest-counts` reconciles any later drift
+    op.execute(
+        "UPDATE product SET interested_count = "
+        "(SELECT COUNT(*) FROM interest WHERE interest.product_id = product.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('interested_count')
@@ -0,0 +1,30 @@
+"""Add (sort key, id) indexes for keyset pagination
+
+Revision ID: 8c41d7e2a9f0
+Revises: 5a2f9c1e7b34
+Create Date: 2026-10-18 10:03:17.842265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d7e2a9f0'
+down_revision = '5a2f9c1e7b34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_price_id', ['price', 'id'], unique=False)
+        batch_op.create_index('ix_product_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_product_interested_count_id', ['interested_count', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_interested_count_id')
+        batch_op.drop_index('ix_product_created_at_id')
+        batch_op.drop_index('ix_product_price_id')
@@ -0,0 +1,30 @@
+"""Add trending_score table
+
+Revision ID: 9b6e3f15c8d2
+Revises: 2d7f81b9e4c3
+Create Date: 2026-10-18 16:40:27.518903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b6e3f15c8d2'
+down_revision = '2d7f81b9e4c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trending_score',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+
+
+def downgrade():
+    op.drop_table('trending_score')
@@ -0,0 +1,48 @@
+"""Add stock holds to cart and the idempotency_key table
+
+Revision ID: a73c5e2d9b16
+Revises: d51a2c9e8f47
+Create Date: 2026-10-18 19:12:40.518326
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a73c5e2d9b16'
+down_revision = 'd51a2c9e8f47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing cart rows start unheld: their quantity was never taken out of stock
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reserved_until', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_cart_product_reserved', ['product_id', 'reserved_until'], unique=False)
+        batch_op.create_index('ix_cart_reserved_until', ['reserved_until'], unique=False)
+
+    op.create_table('idempotency_key',
+    sa.Column('id', sa.String(length=160), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('response_body', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_idempotency_key_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_idempotency_key_created_at'))
+
+    op.drop_table('idempotency_key')
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_reserved_until')
+        batch_op.drop_index('ix_cart_product_reserved')
+        batch_op.drop_column('reserved_until')
@@ -0,0 +1,26 @@
+"""Add (sender_id, receiver_id, id) index to message
+
+Revision ID: b37e0a5d6c18
+Revises: 8c41d7e2a9f0
+Create Date: 2026-10-18 11:26:05.117392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b37e0a5d6c18'
+down_revision = '8c41d7e2a9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.create_index('ix_message_sender_receiver_id', ['sender_id', 'receiver_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('ix_message_sender_receiver_id')
@@ -0,0 +1,58 @@
+"""Add maintained rating aggregates to Product
+
+Revision ID: c4e8a17f3b90
+Revises: 9b6e3f15c8d2
+Create Date: 2026-10-18 17:21:55.840217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a17f3b90'
+down_revision = '9b6e3f15c8d2'
+branch_labels = None
+depends_on = None
+
+# Matches Config.RATING_PRIOR_WEIGHT / RATING_PRIOR_MEAN at the time of writing
+PRIOR_WEIGHT = 5
+PRIOR_MEAN = 3.5
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+        for stars in range(1, 6):
+            batch_op.add_column(sa.Column(f'rating_{stars}', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_bayes', sa.Float(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_product_rating_bayes_id', ['rating_bayes', 'id'], unique=False)
+
+    # Backfill from existing reviews; `flask repair-ratings` reconciles any later drift.
+    # Older reviews weren't range-checked, so like reconcile_ratings() only 1-5 star ones count
+    counted = "FROM review WHERE review.product_id = product.id AND review.rating BETWEEN 1 AND 5"
+    buckets = ", ".join(
+        f"rating_{stars} = (SELECT COUNT(*) FROM review WHERE review.product_id = product.id AND review.rating = {stars})"
+        for stars in range(1, 6)
+    )
+    op.execute(
+        "UPDATE product SET "
+        f"rating_count = (SELECT COUNT(*) {counted}), "
+        f"rating_sum = (SELECT COALESCE(SUM(rating), 0) {counted}), "
+        + buckets
+    )
+    op.execute(
+        f"UPDATE product SET rating_bayes = ({PRIOR_WEIGHT} * {PRIOR_MEAN} + rating_sum) * 1.0 / ({PRIOR_WEIGHT} + rating_count) "
+        "WHERE rating_count > 0"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_rating_bayes_id')
+        batch_op.drop_column('rating_bayes')
+        for stars in range(5, 0, -1):
+            batch_op.drop_column(f'rating_{stars}')
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('rating_count')
@@ -0,0 +1,42 @@
+"""Add coalescing columns and indexes to notification
+
+Revision ID: d51a2c9e8f47
+Revises: c4e8a17f3b90
+Create Date: 2026-10-18 18:05:13.227604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd51a2c9e8f47'
+down_revision = 'c4e8a17f3b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('group_key', sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column('count', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_notification_user_updated_id', ['user_id', 'updated_at', 'id'], unique=False)
+        batch_op.create_index('ix_notification_user_group_read', ['user_id', 'group_key', 'is_read'], unique=False)
+
+    notification = sa.table(
+        'notification', sa.column('created_at', sa.DateTime()), sa.column('updated_at', sa.DateTime()),
+        sa.column('is_read', sa.Boolean()),
+    )
+    op.execute(notification.update().where(notification.c.updated_at.is_(None))
+               .values(updated_at=sa.func.coalesce(notification.c.created_at, sa.func.current_timestamp())))
+    op.execute(notification.update().where(notification.c.is_read.is_(None)).values(is_read=False))
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_user_group_read')
+        batch_op.drop_index('ix_notification_user_updated_id')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('count')
+        batch_op.drop_column('group_key')
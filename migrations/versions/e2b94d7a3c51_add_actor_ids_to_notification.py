@@ -0,0 +1,26 @@
+"""Add actor_ids to notification so coalesced rows count people, not events
+
+Revision ID: e2b94d7a3c51
+Revises: a73c5e2d9b16
+Create Date: 2026-10-18 20:41:07.392815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b94d7a3c51'
+down_revision = 'a73c5e2d9b16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('actor_ids', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_column('actor_ids')
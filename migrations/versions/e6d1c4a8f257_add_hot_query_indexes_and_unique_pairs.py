@@ -0,0 +1,76 @@
+"""Add hot-query indexes and unique (user_id, product_id) on interest and cart
+
+Revision ID: e6d1c4a8f257
+Revises: b37e0a5d6c18
+Create Date: 2026-10-18 13:48:52.630914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6d1c4a8f257'
+down_revision = 'b37e0a5d6c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate cart rows into the oldest one before the unique constraint goes on.
+    # The GROUP BY derived tables let MySQL read the table it is modifying.
+    op.execute(
+        "UPDATE cart SET quantity = ("
+        " SELECT total FROM (SELECT user_id, product_id, SUM(quantity) AS total"
+        "  FROM cart GROUP BY user_id, product_id) AS totals"
+        " WHERE totals.user_id = cart.user_id AND totals.product_id = cart.product_id)"
+    )
+    op.execute(
+        "DELETE FROM cart WHERE id NOT IN ("
+        " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM cart GROUP BY user_id, product_id) AS keep)"
+    )
+    op.execute(
+        "DELETE FROM interest WHERE id NOT IN ("
+        " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM interest GROUP BY user_id, product_id) AS keep)"
+    )
+    # Duplicates were counted by the interested_count backfill
+    op.execute(
+        "UPDATE product SET interested_count = "
+        "(SELECT COUNT(*) FROM interest WHERE interest.product_id = product.id)"
+    )
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_category_price_id', ['category', 'price', 'id'], unique=False)
+        batch_op.create_index('ix_product_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.create_index('ix_message_receiver_read_sender', ['receiver_id', 'is_read', 'sender_id'], unique=False)
+
+    with op.batch_alter_table('interest', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_interest_user_product', ['user_id', 'product_id'])
+        batch_op.create_index('ix_interest_product_id', ['product_id'], unique=False)
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_cart_user_product', ['user_id', 'product_id'])
+
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.create_index('ix_review_product_created', ['product_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('review', schema=None) as batch_op:
+        batch_op.drop_index('ix_review_product_created')
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_cart_user_product', type_='unique')
+
+    with op.batch_alter_table('interest', schema=None) as batch_op:
+        batch_op.drop_index('ix_interest_product_id')
+        batch_op.drop_constraint('uq_interest_user_product', type_='unique')
+
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('ix_message_receiver_read_sender')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_user_id')
+        batch_op.drop_index('ix_product_category_price_id')
@@ -0,0 +1,26 @@
+"""Add image_variants to Product
+
+Revision ID: f0a93b7c2d61
+Revises: e6d1c4a8f257
+Create Date: 2026-10-18 14:37:20.981556
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0a93b7c2d61'
+down_revision = 'e6d1c4a8f257'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_variants', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('image_variants')
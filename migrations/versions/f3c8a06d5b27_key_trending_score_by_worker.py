@@ -0,0 +1,50 @@
+"""Key trending_score by (product_id, worker) so workers persist their own shares
+
+Revision ID: f3c8a06d5b27
+Revises: e2b94d7a3c51
+Create Date: 2026-10-18 21:37:52.106384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a06d5b27'
+down_revision = 'e2b94d7a3c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The primary key changes, so rebuild the table; existing scores become one legacy worker's share
+    op.create_table('trending_score_new',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('worker', sa.String(length=64), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'worker')
+    )
+    op.execute(
+        "INSERT INTO trending_score_new (product_id, worker, score, computed_at) "
+        "SELECT product_id, '', score, computed_at FROM trending_score"
+    )
+    op.drop_table('trending_score')
+    op.rename_table('trending_score_new', 'trending_score')
+
+
+def downgrade():
+    op.create_table('trending_score_old',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.execute(
+        "INSERT INTO trending_score_old (product_id, score, computed_at) "
+        "SELECT product_id, SUM(score), MAX(computed_at) FROM trending_score GROUP BY product_id"
+    )
+    op.drop_table('trending_score')
+    op.rename_table('trending_score_old', 'trending_score')